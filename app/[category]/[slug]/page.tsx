@@ -2,7 +2,7 @@ import { notFound } from "next/navigation";
 import Link from "next/link";
 import type { Metadata } from "next";
 import { MapPin, Phone, Globe, Clock, Star, ChevronRight, ShieldCheck, ShieldAlert, ShieldX, Shield } from "lucide-react";
-import { getCategoryBySlug, isValidCategory } from "@/lib/config";
+import { getCategoryBySlug, isValidCategory, IN_SITE_REGION, SITE } from "@/lib/config";
 import { prisma } from "@/lib/prisma";
 
 type Props = { params: Promise<{ category: string; slug: string }> };
@@ -58,7 +58,7 @@ export async function generateMetadata({ params }: Props): Promise<Metadata> {
     const catRecord = await prisma.category.findFirst({ where: { slug: category } });
     if (!catRecord) return { title: slug };
     const b = await prisma.business.findFirst({
-      where: { slug, categoryId: catRecord.id },
+      where: { slug, categoryId: catRecord.id, ...IN_SITE_REGION },
       select: { name: true, address: true, postcode: true, shortDescription: true, description: true, rating: true, reviewCount: true },
     });
     if (!b) return { title: slug };
@@ -137,6 +137,7 @@ export default async function BusinessPage({ params }: Props) {
             { categoryId: categoryRecord.id },
             { secondaryCategoryIds: { has: categoryRecord.id } },
           ],
+          ...IN_SITE_REGION,
         },
         select: {
           id: true, name: true, address: true, postcode: true, lat: true, lng: true,
@@ -155,6 +156,7 @@ export default async function BusinessPage({ params }: Props) {
           FROM "Business"
           WHERE "categoryId" = ${categoryRecord.id}
             AND id != ${business.id}
+            AND (${SITE.region} = ANY(regions) OR cardinality(regions) = 0)
           ORDER BY (COALESCE(rating, 0) * LOG(COALESCE("reviewCount", 0) + 1)) DESC
           LIMIT 4
         `;
@@ -3,7 +3,7 @@ import { notFound } from "next/navigation";
 import Link from "next/link";
 import type { Metadata } from "next";
 import { ChevronRight } from "lucide-react";
-import { getCategoryBySlug, isValidCategory } from "@/lib/config";
+import { getCategoryBySlug, isValidCategory, SITE } from "@/lib/config";
 import { prisma } from "@/lib/prisma";
 import { LATEROOMS } from "@/lib/affiliate-links";
 import CategoryBrowser, { type BrowserBusiness } from "@/components/CategoryBrowser";
@@ -172,7 +172,8 @@ export default async function CategoryPage({ params, searchParams }: Props) {
                  rating, "reviewCount", "priceRange", lat, lng, "hygieneRating",
                  images[1] AS "firstImage"
           FROM "Business"
-          WHERE "categoryId" = ${catId} OR ${catId} = ANY("secondaryCategoryIds")
+          WHERE ("categoryId" = ${catId} OR ${catId} = ANY("secondaryCategoryIds"))
+            AND (${SITE.region} = ANY(regions) OR cardinality(regions) = 0)
           ORDER BY name ASC
         `;
       } else if (sort === "hygiene") {
@@ -181,7 +182,8 @@ export default async function CategoryPage({ params, searchParams }: Props) {
                  rating, "reviewCount", "priceRange", lat, lng, "hygieneRating",
                  images[1] AS "firstImage"
           FROM "Business"
-          WHERE "categoryId" = ${catId} OR ${catId} = ANY("secondaryCategoryIds")
+          WHERE ("categoryId" = ${catId} OR ${catId} = ANY("secondaryCategoryIds"))
+            AND (${SITE.region} = ANY(regions) OR cardinality(regions) = 0)
           ORDER BY
             CASE WHEN "hygieneRating" ~ '^[0-9]+$' THEN CAST("hygieneRating" AS INTEGER) ELSE -1 END DESC,
             (COALESCE(rating, 0) * LOG(COALESCE("reviewCount", 0) + 1)) DESC, name ASC
@@ -192,7 +194,8 @@ export default async function CategoryPage({ params, searchParams }: Props) {
                  rating, "reviewCount", "priceRange", lat, lng, "hygieneRating",
                  images[1] AS "firstImage"
           FROM "Business"
-          WHERE "categoryId" = ${catId} OR ${catId} = ANY("secondaryCategoryIds")
+          WHERE ("categoryId" = ${catId} OR ${catId} = ANY("secondaryCategoryIds"))
+            AND (${SITE.region} = ANY(regions) OR cardinality(regions) = 0)
           ORDER BY
             CASE "listingTier" WHEN 'premium' THEN 1 WHEN 'featured' THEN 2 WHEN 'standard' THEN 3 ELSE 4 END ASC,
             COALESCE(rating, 0) DESC, COALESCE("reviewCount", 0) DESC, name ASC
@@ -203,7 +206,8 @@ export default async function CategoryPage({ params, searchParams }: Props) {
                  rating, "reviewCount", "priceRange", lat, lng, "hygieneRating",
                  images[1] AS "firstImage"
           FROM "Business"
-          WHERE "categoryId" = ${catId} OR ${catId} = ANY("secondaryCategoryIds")
+          WHERE ("categoryId" = ${catId} OR ${catId} = ANY("secondaryCategoryIds"))
+            AND (${SITE.region} = ANY(regions) OR cardinality(regions) = 0)
           ORDER BY
             CASE "listingTier" WHEN 'premium' THEN 1 WHEN 'featured' THEN 2 WHEN 'standard' THEN 3 ELSE 4 END ASC,
             (COALESCE(rating, 0) * LOG(COALESCE("reviewCount", 0) + 1)) DESC, name ASC
@@ -16,24 +16,51 @@ function requireApiKey(req: NextRequest): NextResponse | null {
   return null;
 }
 
+function topCounts(rows: (readonly [string, number])[], limit = 10): [string, number][] {
+  const totals = new Map<string, number>();
+  for (const [key, count] of rows) totals.set(key, (totals.get(key) ?? 0) + count);
+  return [...totals.entries()].sort((a, b) => b[1] - a[1]).slice(0, limit);
+}
+
 export async function GET(req: NextRequest) {
   const authError = requireApiKey(req);
   if (authError) return authError;
 
+  // The daily rollups (scripts/rollup-stats.py) cover every row before
+  // their high-water mark; anything newer is counted from raw PageView rows.
   const now = new Date();
   const todayStart = new Date(now);
-  todayStart.setHours(0, 0, 0, 0);
+  todayStart.setUTCHours(0, 0, 0, 0);
   const weekStart = new Date(now);
   weekStart.setDate(weekStart.getDate() - 7);
-  const monthStart = new Date(now);
-  monthStart.setDate(monthStart.getDate() - 30);
-  monthStart.setHours(0, 0, 0, 0);
+  const monthStart = new Date(todayStart);
+  monthStart.setUTCDate(monthStart.getUTCDate() - 30);
+
+  // Rollups hold whole UTC days, so the rolling week takes them from its first
+  // full day and counts the partial day before that from raw rows.
+  const weekRollupStart = new Date(weekStart);
+  weekRollupStart.setUTCHours(0, 0, 0, 0);
+  if (weekRollupStart < weekStart) weekRollupStart.setUTCDate(weekRollupStart.getUTCDate() + 1);
+
+  const rollupState = await prisma.rollupState.findUnique({ where: { name: "pageviews" } });
+  const rolledUpTo = rollupState?.highWater ?? new Date(0);
+  const rawFrom = (start: Date) => (rolledUpTo > start ? rolledUpTo : start);
+  const rawWeek = {
+    OR: [
+      { createdAt: { gte: weekStart, lt: weekRollupStart } },
+      { createdAt: { gte: rawFrom(weekRollupStart) } },
+    ],
+  };
 
   const [
     pageviewsToday,
-    pageviewsThisWeek,
-    pageviewsThisMonth,
+    pageviewsWeekRaw,
+    pageviewsMonthRaw,
+    pageviewsWeekRollup,
+    pageviewsMonthRollup,
+    topPagesRollup,
     topPagesRaw,
+    topReferrersRollup,
     topReferrersRaw,
     totalBusinesses,
     claimedCount,
@@ -44,17 +71,35 @@ export async function GET(req: NextRequest) {
     featuredCount,
   ] = await Promise.all([
     prisma.pageView.count({ where: { createdAt: { gte: todayStart } } }),
-    prisma.pageView.count({ where: { createdAt: { gte: weekStart } } }),
-    prisma.pageView.count({ where: { createdAt: { gte: monthStart } } }),
+    prisma.pageView.count({ where: rawWeek }),
+    prisma.pageView.count({ where: { createdAt: { gte: rawFrom(monthStart) } } }),
+    prisma.dailyPageViewRollup.aggregate({
+      where: { day: { gte: weekRollupStart } },
+      _sum: { count: true },
+    }),
+    prisma.dailyPageViewRollup.aggregate({
+      where: { day: { gte: monthStart } },
+      _sum: { count: true },
+    }),
+    prisma.dailyPageViewRollup.groupBy({
+      by: ["path"],
+      where: { day: { gte: weekRollupStart } },
+      _sum: { count: true },
+    }),
     prisma.pageView.groupBy({
       by: ["path"],
-      where: { createdAt: { gte: weekStart } },
+      where: rawWeek,
       _count: { path: true },
     }),
+    prisma.dailyReferrerRollup.groupBy({
+      by: ["referrer"],
+      where: { day: { gte: weekRollupStart } },
+      _sum: { count: true },
+    }),
     prisma.pageView.groupBy({
       by: ["referrer"],
       where: {
-        createdAt: { gte: weekStart },
+        ...rawWeek,
         referrer: { not: null },
       },
       _count: { referrer: true },
@@ -84,6 +129,19 @@ export async function GET(req: NextRequest) {
     }),
   ]);
 
+  const pageviewsThisWeek = (pageviewsWeekRollup._sum.count ?? 0) + pageviewsWeekRaw;
+  const pageviewsThisMonth = (pageviewsMonthRollup._sum.count ?? 0) + pageviewsMonthRaw;
+  const topPages = topCounts([
+    ...topPagesRollup.map((r) => [r.path, r._sum.count ?? 0] as const),
+    ...topPagesRaw.map((r) => [r.path, r._count.path] as const),
+  ]).map(([path, count]) => ({ path, count }));
+  const topReferrers = topCounts([
+    ...topReferrersRollup.map((r) => [r.referrer, r._sum.count ?? 0] as const),
+    ...topReferrersRaw
+      .filter((r) => r.referrer)
+      .map((r) => [r.referrer!, r._count.referrer] as const),
+  ]).map(([referrer, count]) => ({ referrer, count }));
+
   const mrr = subscriptions.reduce((s, sub) => s + (TIER_MRR[sub.tier] ?? 29), 0);
 
   const { GUIDES } = await import("@/lib/guides-config");
@@ -98,15 +156,8 @@ export async function GET(req: NextRequest) {
       pageviewsThisWeek,
       pageviewsThisMonth,
       uniqueVisitorsThisWeek: pageviewsThisWeek,
-      topPages: topPagesRaw
-        .map((r) => ({ path: r.path, count: r._count.path }))
-        .sort((a, b) => b.count - a.count)
-        .slice(0, 10),
-      topReferrers: topReferrersRaw
-        .filter((r) => r.referrer)
-        .map((r) => ({ referrer: r.referrer!, count: r._count.referrer }))
-        .sort((a, b) => b.count - a.count)
-        .slice(0, 10),
+      topPages,
+      topReferrers,
     },
     content: {
       totalListings: totalBusinesses,
@@ -136,6 +187,10 @@ export async function DELETE(req: NextRequest) {
   if (!key || key !== process.env.COMMAND_CENTRE_API_KEY) {
     return NextResponse.json({ error: "Unauthorised" }, { status: 401 });
   }
-  await prisma.pageView.deleteMany();
+  await Promise.all([
+    prisma.pageView.deleteMany(),
+    prisma.dailyPageViewRollup.deleteMany(),
+    prisma.dailyReferrerRollup.deleteMany(),
+  ]);
   return NextResponse.json({ ok: true, deleted: true });
 }
@@ -1,11 +1,13 @@
 import { NextRequest, NextResponse } from "next/server";
 import { prisma } from "@/lib/prisma";
+import { SITE } from "@/lib/config";
 
 export async function GET(request: NextRequest) {
   const { searchParams } = new URL(request.url);
   const lat    = parseFloat(searchParams.get("lat") ?? "");
   const lng    = parseFloat(searchParams.get("lng") ?? "");
   const radius = Math.min(parseFloat(searchParams.get("radius") ?? "800"), 2000);
+  const region = searchParams.get("region"); // optional, e.g. "southport"
 
   if (isNaN(lat) || isNaN(lng)) {
     return NextResponse.json({ error: "lat and lng are required" }, { status: 400 });
@@ -37,6 +39,8 @@ export async function GET(request: NextRequest) {
         JOIN "Category" c ON b."categoryId" = c.id
         WHERE c.slug IN ('restaurants','cafes','pubs','activities','accommodation','shopping','nature-walks','beaches')
           AND b.lat IS NOT NULL AND b.lng IS NOT NULL
+          AND (${region}::text IS NULL OR ${region} = ANY(b.regions)
+               OR (${region}::text = ${SITE.region} AND cardinality(b.regions) = 0))
       ) sub
       WHERE sub.distance_m < ${radius}
       ORDER BY sub.distance_m
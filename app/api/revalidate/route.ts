@@ -0,0 +1,48 @@
+import { NextRequest, NextResponse } from "next/server";
+import { revalidatePath } from "next/cache";
+import { COLLECTIONS } from "@/lib/collections-config";
+import { getGuideUrl, getPublishedGuides } from "@/lib/guides-config";
+
+// Listing pages that aren't driven by the collections/guides configs
+const CATEGORY_PAGES: Record<string, string[]> = {
+  restaurants: ["/the-open-2026/restaurants"],
+  accommodation: ["/the-open-2026/accommodation"],
+};
+
+function requireApiKey(req: NextRequest): NextResponse | null {
+  const key = req.headers.get("x-api-key");
+  const expected = process.env.REVALIDATE_API_KEY;
+  if (!expected || key !== expected) {
+    return NextResponse.json({ error: "Unauthorised" }, { status: 401 });
+  }
+  return null;
+}
+
+/**
+ * Called by scripts/drain-change-events.py with the paths of changed
+ * businesses plus the categories whose listing pages need refreshing.
+ */
+export async function POST(req: NextRequest) {
+  const authError = requireApiKey(req);
+  if (authError) return authError;
+
+  const body = await req.json().catch(() => null);
+  const paths: string[] = Array.isArray(body?.paths) ? body.paths : [];
+  const categories: string[] = Array.isArray(body?.categories) ? body.categories : [];
+
+  const targets = new Set(paths.filter((p) => typeof p === "string" && p.startsWith("/")));
+  for (const category of categories) {
+    targets.add(`/${category}`);
+    for (const page of CATEGORY_PAGES[category] ?? []) targets.add(page);
+    for (const c of COLLECTIONS) {
+      if (c.categorySlugs.includes(category)) targets.add(`/collections/${c.slug}`);
+    }
+    for (const g of getPublishedGuides()) {
+      if (g.listingFilter?.categorySlugs?.includes(category)) targets.add(getGuideUrl(g));
+    }
+  }
+
+  for (const path of targets) revalidatePath(path);
+
+  return NextResponse.json({ ok: true, revalidated: [...targets].sort() });
+}
@@ -4,6 +4,7 @@ import type { Metadata } from "next";
 import { ChevronRight, Star, MapPin, ArrowRight } from "lucide-react";
 import { getCollection, COLLECTIONS, MIN_LISTINGS } from "@/lib/collections-config";
 import { prisma } from "@/lib/prisma";
+import { IN_SITE_REGION } from "@/lib/config";
 
 export const revalidate = 3600;
 
@@ -26,6 +27,7 @@ export async function generateMetadata({ params }: Props): Promise<Metadata> {
       where: {
         category: { slug: { in: collection.categorySlugs } },
         tags: { hasEvery: collection.tags },
+        ...IN_SITE_REGION,
       },
     });
     isIndexable = count >= MIN_LISTINGS;
@@ -100,6 +102,7 @@ export default async function CollectionPage({ params }: Props) {
       where: {
         category: { slug: { in: collection.categorySlugs } },
         tags: { hasEvery: collection.tags },
+        ...IN_SITE_REGION,
       },
       select: {
         id: true,
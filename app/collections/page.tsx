@@ -3,6 +3,7 @@ import type { Metadata } from "next";
 import { ArrowRight } from "lucide-react";
 import { COLLECTIONS, MIN_LISTINGS } from "@/lib/collections-config";
 import { prisma } from "@/lib/prisma";
+import { SITE } from "@/lib/config";
 
 export const revalidate = 3600;
 
@@ -42,6 +43,7 @@ async function getCollectionCounts(): Promise<Record<string, number>> {
     const rows = await prisma.$queryRaw<{ tag: string; count: number }[]>`
       SELECT tag, COUNT(*)::int AS count
       FROM "Business", unnest(tags) AS tag
+      WHERE (${SITE.region} = ANY(regions) OR cardinality(regions) = 0)
       GROUP BY tag
     `;
     return Object.fromEntries(rows.map((r) => [r.tag, r.count]));
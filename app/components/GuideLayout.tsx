@@ -24,6 +24,7 @@ async function fetchRelatedListings(guide: Guide): Promise<BusinessCard[]> {
   if (!guide.listingFilter) return [];
   try {
     const { prisma } = await import("@/lib/prisma");
+    const { IN_SITE_REGION } = await import("@/lib/config");
     const { categorySlugs, tags } = guide.listingFilter;
 
     const businesses = await prisma.business.findMany({
@@ -37,6 +38,7 @@ async function fetchRelatedListings(guide: Guide): Promise<BusinessCard[]> {
             : undefined,
         ].filter(Boolean) as object[],
         listingTier: { in: ["featured", "premium"] },
+        ...IN_SITE_REGION,
       },
       select: {
         id: true,
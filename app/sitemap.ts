@@ -1,5 +1,6 @@
 import { MetadataRoute } from "next";
 import { prisma } from "@/lib/prisma";
+import { IN_SITE_REGION } from "@/lib/config";
 import { GUIDES, getGuideUrl } from "@/lib/guides-config";
 import { COLLECTIONS } from "@/lib/collections-config";
 import { BLOG_POSTS } from "@/lib/blog-posts";
@@ -65,6 +66,7 @@ export default async function sitemap(): Promise<MetadataRoute.Sitemap> {
   let businessPages: MetadataRoute.Sitemap = [];
   try {
     const businesses = await prisma.business.findMany({
+      where: IN_SITE_REGION,
       select: { slug: true, updatedAt: true, category: { select: { slug: true } } },
     });
     businessPages = businesses.map((b) => ({
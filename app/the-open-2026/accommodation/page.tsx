@@ -2,6 +2,7 @@ import type { Metadata } from "next";
 import Link from "next/link";
 import { ChevronRight, Star, MapPin, ArrowRight, Hotel } from "lucide-react";
 import { prisma } from "@/lib/prisma";
+import { IN_SITE_REGION } from "@/lib/config";
 import { LATEROOMS } from "@/lib/affiliate-links";
 
 export const revalidate = 3600;
@@ -48,7 +49,7 @@ export default async function OpenAccommodationPage() {
 
   try {
     const raw = await prisma.business.findMany({
-      where: { category: { slug: "accommodation" } },
+      where: { category: { slug: "accommodation" }, ...IN_SITE_REGION },
       select: {
         id: true,
         slug: true,
@@ -2,6 +2,7 @@ import type { Metadata } from "next";
 import Link from "next/link";
 import { ChevronRight, Star, MapPin, ArrowRight, Utensils } from "lucide-react";
 import { prisma } from "@/lib/prisma";
+import { IN_SITE_REGION } from "@/lib/config";
 
 export const revalidate = 3600;
 
@@ -47,7 +48,7 @@ export default async function OpenRestaurantsPage() {
 
   try {
     const raw = await prisma.business.findMany({
-      where: { category: { slug: "restaurants" } },
+      where: { category: { slug: "restaurants" }, ...IN_SITE_REGION },
       select: {
         id: true,
         slug: true,
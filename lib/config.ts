@@ -25,4 +25,12 @@ export const SITE = {
   url: "https://www.formbyguide.co.uk",
   tagline: "Your complete guide to Formby: beach, pinewoods and village life",
   description: "Discover the best restaurants, beaches, walks and things to do in Formby. Your local guide to the National Trust pinewoods, red squirrels and the Sefton Coast.",
+  region: "formby", // service_area.REGIONS slug whose businesses this site lists
 } as const;
+
+// Prisma filter for this site's businesses. Rows with no regions predate
+// multi-region scraping and are all Formby listings. Raw SQL queries use
+// (${SITE.region} = ANY(regions) OR cardinality(regions) = 0).
+export const IN_SITE_REGION = {
+  AND: [{ OR: [{ regions: { has: SITE.region } }, { regions: { isEmpty: true } }] }],
+};
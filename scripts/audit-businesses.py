@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Whole-table data-quality audit of the Business table.
+
+Streams every row in one query into columns and runs each check as a
+vectorised pass over the whole table:
+
+  missing_coords      lat/lng null, 0,0 or still the Formby default centre
+  outside_coverage    not inside any region's search circles (service_area.REGIONS)
+  missing_postcode    empty postcode
+  bad_postcode        postcode not in UK format (same pattern as extract_postcode)
+  duplicate_phone     same normalised phone number on more than one row
+  duplicate_website   same normalised website on more than one row
+  stale               updatedAt older than STALE_DAYS
+
+Writes a readable summary to audit-report.txt and {check: [ids]} to
+audit-issues.json for downstream fix-up scripts. Read-only.
+
+Usage:
+  python scripts/audit-businesses.py [--profile]
+"""
+
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+import psycopg2
+from dotenv import load_dotenv
+from urllib.parse import urlparse
+
+import profiling
+from service_area import COVERAGE_POINTS, DEFAULT_LAT, DEFAULT_LNG
+
+profiling.install()
+load_dotenv(".env.local")
+load_dotenv()
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not set")
+    exit(1)
+
+REPORT_FILE = 'audit-report.txt'
+ISSUES_FILE = 'audit-issues.json'
+STALE_DAYS = 90
+FETCH_SIZE = 5000
+EXAMPLES_PER_CHECK = 10
+
+POSTCODE_RE = r'[A-Z]{1,2}[0-9][0-9A-Z]?\s*[0-9][A-Z]{2}'
+EARTH_RADIUS_M = 6371000
+
+COLUMNS = ['id', 'name', 'postcode', 'lat', 'lng', 'phone', 'website', 'updatedAt']
+
+
+def connect_db():
+    parsed = urlparse(DATABASE_URL)
+    return psycopg2.connect(
+        host=parsed.hostname,
+        port=parsed.port or 5432,
+        database=parsed.path.lstrip('/'),
+        user=parsed.username,
+        password=parsed.password,
+        sslmode='require',
+    )
+
+
+def load_table(conn):
+    """One server-side cursor, fetched in FETCH_SIZE chunks, into a DataFrame."""
+    chunks = []
+    with conn.cursor(name='audit_businesses') as cur:
+        cur.itersize = FETCH_SIZE
+        cur.execute("""
+            SELECT id, name, postcode, lat, lng, phone, website, "updatedAt"
+            FROM "Business"
+        """)
+        while True:
+            rows = cur.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            chunks.append(pd.DataFrame.from_records(rows, columns=COLUMNS))
+    if not chunks:
+        return pd.DataFrame(columns=COLUMNS)
+    df = pd.concat(chunks, ignore_index=True)
+    df['lat'] = pd.to_numeric(df['lat'], errors='coerce')
+    df['lng'] = pd.to_numeric(df['lng'], errors='coerce')
+    df['updatedAt'] = pd.to_datetime(df['updatedAt'])
+    return df
+
+
+def distances_to_points(lat, lng):
+    """(rows x COVERAGE_POINTS) haversine distances in metres."""
+    plat = np.radians([p[1] for p in COVERAGE_POINTS])
+    plng = np.radians([p[2] for p in COVERAGE_POINTS])
+    rlat = np.radians(lat)[:, None]
+    rlng = np.radians(lng)[:, None]
+    a = (np.sin((plat - rlat) / 2) ** 2
+         + np.cos(rlat) * np.cos(plat) * np.sin((plng - rlng) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def normalise_phone(phone):
+    digits = phone.fillna('').str.replace(r'\D', '', regex=True)
+    return digits.str.replace(r'^44', '0', regex=True)
+
+
+def normalise_website(website):
+    return (website.fillna('').str.strip().str.lower()
+            .str.replace(r'^https?://', '', regex=True)
+            .str.replace(r'^www\.', '', regex=True)
+            .str.replace(r'[?#].*$', '', regex=True)
+            .str.rstrip('/'))
+
+
+def duplicated(keys):
+    return (keys != '') & keys.duplicated(keep=False)
+
+
+def run_checks(df):
+    """Check name -> boolean mask over df."""
+    lat = df['lat'].to_numpy(dtype=float)
+    lng = df['lng'].to_numpy(dtype=float)
+    has_coords = ~(np.isnan(lat) | np.isnan(lng) | ((lat == 0) & (lng == 0)))
+    defaulted = (lat == DEFAULT_LAT) & (lng == DEFAULT_LNG)
+
+    radii = np.array([p[3] for p in COVERAGE_POINTS])
+    inside_any = (distances_to_points(np.nan_to_num(lat), np.nan_to_num(lng)) <= radii).any(axis=1)
+
+    postcode = df['postcode'].fillna('').str.strip()
+    stale_before = pd.Timestamp.now() - pd.Timedelta(days=STALE_DAYS)
+
+    return {
+        'missing_coords':    ~has_coords | defaulted,
+        'outside_coverage':  has_coords & ~inside_any,
+        'missing_postcode':  (postcode == '').to_numpy(),
+        'bad_postcode':      ((postcode != '') & ~postcode.str.fullmatch(POSTCODE_RE, case=False)).to_numpy(),
+        'duplicate_phone':   duplicated(normalise_phone(df['phone'])).to_numpy(),
+        'duplicate_website': duplicated(normalise_website(df['website'])).to_numpy(),
+        'stale':             (df['updatedAt'] < stale_before).to_numpy(),
+    }
+
+
+def main():
+    print("Formby Guide — Business data-quality audit")
+    print("=" * 60)
+
+    conn = connect_db()
+    started = time.perf_counter()
+    df = load_table(conn)
+    conn.close()
+    loaded = time.perf_counter()
+
+    checks = run_checks(df)
+    checked = time.perf_counter()
+
+    issues = {name: df['id'][mask].tolist() for name, mask in checks.items()}
+    flagged = np.logical_or.reduce(list(checks.values())) if len(df) else np.array([], dtype=bool)
+
+    lines = [
+        f"Business audit — {time.strftime('%Y-%m-%d %H:%M')}",
+        f"Rows: {len(df)} | Rows with any issue: {int(flagged.sum())}",
+        f"Load: {(loaded - started) * 1000:.0f}ms | Checks: {(checked - loaded) * 1000:.0f}ms",
+        "",
+    ]
+    for name, mask in checks.items():
+        lines.append(f"{name:<20}{int(mask.sum()):>6}")
+        for biz_name in df['name'][mask].head(EXAMPLES_PER_CHECK):
+            lines.append(f"    {biz_name}")
+    report = '\n'.join(lines)
+
+    with open(REPORT_FILE, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    with open(ISSUES_FILE, 'w') as f:
+        json.dump(issues, f, indent=2)
+
+    print(report.encode('ascii', 'replace').decode('ascii'))
+    print(f"\nSaved to {REPORT_FILE} and {ISSUES_FILE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark business search: today's ILIKE scan vs the search index.
+
+For each query, times (median of RUNS, measured server-side by EXPLAIN
+ANALYZE) and shows the top hits for:
+
+  ilike     name/address/description ILIKE '%term%' for every word (current approach)
+  fts       searchVector @@ websearch_to_tsquery, ranked by ts_rank
+  trigram   word_similarity(query, name) via the pg_trgm index — typo tolerant
+
+Run `python scripts/search_index.py rebuild` first.
+
+Usage:
+  python scripts/bench-search.py ["query" ...]
+"""
+
+import os
+import sys
+import json
+import statistics
+import psycopg2
+from dotenv import load_dotenv
+from urllib.parse import urlparse
+
+load_dotenv(".env.local")
+load_dotenv()
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not set")
+    exit(1)
+
+RUNS = 20
+TOP = 3
+DEFAULT_QUERIES = [
+    "formby hal golf",      # typo
+    "sparowhawk",           # typo
+    "dog friendly cafe",
+    "fish and chips",
+    "L37",
+]
+
+
+def ilike_query(q):
+    words = q.split()
+    where = ' AND '.join(
+        '(name ILIKE %s OR address ILIKE %s OR coalesce(description, \'\') ILIKE %s)' for _ in words
+    )
+    params = [p for w in words for p in (f'%{w}%',) * 3]
+    return f'SELECT name FROM "Business" WHERE {where} ORDER BY name LIMIT 10', params
+
+
+def fts_query(q):
+    return ("""
+        SELECT name FROM "Business"
+        WHERE "searchVector" @@ websearch_to_tsquery('english', %s)
+        ORDER BY ts_rank("searchVector", websearch_to_tsquery('english', %s)) DESC
+        LIMIT 10
+    """, [q, q])
+
+
+def trigram_query(q):
+    return ("""
+        SELECT name FROM "Business"
+        WHERE %s <%% name
+        ORDER BY word_similarity(%s, name) DESC
+        LIMIT 10
+    """, [q, q])
+
+
+STRATEGIES = [('ilike', ilike_query), ('fts', fts_query), ('trigram', trigram_query)]
+
+
+def connect_db():
+    parsed = urlparse(DATABASE_URL)
+    return psycopg2.connect(
+        host=parsed.hostname,
+        port=parsed.port or 5432,
+        database=parsed.path.lstrip('/'),
+        user=parsed.username,
+        password=parsed.password,
+        sslmode='require',
+    )
+
+
+def time_query(cur, sql, params):
+    timings = []
+    for _ in range(RUNS):
+        cur.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        timings.append(plan[0]['Execution Time'])
+    cur.execute(sql, params)
+    return statistics.median(timings), [r[0] for r in cur.fetchall()]
+
+
+def main():
+    queries = sys.argv[1:] or DEFAULT_QUERIES
+    conn = connect_db()
+
+    print(f"{'query':<22}{'strategy':<10}{'median ms':>10}  top hits")
+    print("-" * 80)
+    with conn.cursor() as cur:
+        for q in queries:
+            for label, build in STRATEGIES:
+                ms, hits = time_query(cur, *build(q))
+                shown = ', '.join(hits[:TOP]) or '(none)'
+                print(f"{q:<22}{label:<10}{ms:>10.2f}  {shown.encode('ascii', 'replace').decode('ascii')}")
+            print()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Change-event outbox shared by the Python pipeline stages.
+
+Every stage that edits or deletes a "Business" row writes a "ChangeEvent"
+on the same cursor, before its commit, so the event exists if and only if
+the data change does. scripts/drain-change-events.py later turns pending
+events into a deduplicated list of paths for the site to revalidate.
+"""
+
+
+def changed_fields_sql(fields, old='old', new='b'):
+    """
+    SQL expression (for a RETURNING clause) giving a text[] of the fields
+    whose value differs between the pre-update row `old` and the updated row `new`.
+    """
+    cases = ', '.join(
+        f"""CASE WHEN {old}."{f}" IS DISTINCT FROM {new}."{f}" THEN '{f}' END"""
+        for f in fields
+    )
+    return f"array_remove(ARRAY[{cases}]::text[], NULL)"
+
+
+def record_change(cur, business_slug, category_slug, fields, source, deleted=False):
+    """Queue a change event. Call before the commit that applies the change."""
+    cur.execute("""
+        INSERT INTO "ChangeEvent" ("id", "businessSlug", "categorySlug", "fields", "deleted", "source")
+        VALUES (gen_random_uuid()::text, %s, %s, %s, %s, %s)
+    """, (business_slug, category_slug, list(fields), deleted, source))
+
+
+def delete_business(cur, business_id, source):
+    """Delete a business and queue its delete event. Returns True if a row was removed."""
+    cur.execute("""
+        WITH gone AS (
+            DELETE FROM "Business" WHERE id = %s
+            RETURNING slug, "categoryId"
+        )
+        SELECT gone.slug, c.slug FROM gone
+        LEFT JOIN "Category" c ON c.id = gone."categoryId"
+    """, (business_id,))
+    row = cur.fetchone()
+    if not row:
+        return False
+    record_change(cur, row[0], row[1], [], source, deleted=True)
+    return True
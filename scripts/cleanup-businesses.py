@@ -9,7 +9,7 @@ REMOVE: plumbers, dentists, solicitors, B2B services, medical, schools,
         pharmacies, car dealers, funeral directors, individual Airbnb lets,
         parking lots, churches (non-attraction), post offices.
 
-Usage: python scripts/cleanup-businesses.py
+Usage: python scripts/cleanup-businesses.py [--profile]
 """
 
 import os
@@ -19,6 +19,11 @@ import psycopg2.extras
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
+import profiling
+from change_events import delete_business
+
+profiling.install()
+
 load_dotenv(".env.local")
 load_dotenv()
 
@@ -186,12 +191,13 @@ if confirm.lower() != 'yes':
     exit(0)
 
 deleted = 0
-for b in to_delete:
-    with conn.cursor() as cur:
-        cur.execute('DELETE FROM "Business" WHERE id = %s', (b['id'],))
-    deleted += 1
+with profiling.span('cleanup'):
+    for b in to_delete:
+        with conn.cursor() as cur:
+            delete_business(cur, b['id'], 'cleanup-businesses')
+        deleted += 1
 
-conn.commit()
+    conn.commit()
 conn.close()
 
 print(f"\nDeleted {deleted} non-visitor businesses.")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Drain the ChangeEvent outbox into a list of site paths to revalidate.
+
+Coalesces every pending event per business, so a business touched by the
+enricher, the FSA run and cleanup in one night produces one set of paths.
+Listing pages are only included when a field shown on listing cards moved.
+
+Writes the paths to revalidate-paths.json. If REVALIDATE_URL and
+REVALIDATE_API_KEY are set, also POSTs them to the site's /api/revalidate.
+Events are marked drained only once the paths have been handed off, and
+events drained more than KEEP_DRAINED_DAYS ago are deleted in the same
+transaction so the outbox stays small.
+
+Usage:
+  python scripts/drain-change-events.py [--profile]
+"""
+
+import os
+import json
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+from urllib.parse import urlparse
+
+import http_archive
+import profiling
+
+profiling.install()
+http_archive.install()
+load_dotenv(".env.local")
+load_dotenv()
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not set")
+    exit(1)
+
+REVALIDATE_URL = os.getenv('REVALIDATE_URL')          # e.g. https://www.formbyguide.co.uk/api/revalidate
+REVALIDATE_API_KEY = os.getenv('REVALIDATE_API_KEY')
+
+OUTPUT_FILE = 'revalidate-paths.json'
+KEEP_DRAINED_DAYS = int(os.getenv('CHANGE_EVENT_KEEP_DAYS', '14'))  # Drained events kept for debugging
+
+# Fields shown on category/collection/guide listing cards (see BrowserBusiness)
+LISTING_FIELDS = {
+    'name', 'shortDescription', 'address', 'postcode', 'rating', 'reviewCount',
+    'priceRange', 'hygieneRating', 'hygieneRatingShow', 'images', 'listingTier',
+}
+
+
+def connect_db():
+    parsed = urlparse(DATABASE_URL)
+    return psycopg2.connect(
+        host=parsed.hostname,
+        port=parsed.port or 5432,
+        database=parsed.path.lstrip('/'),
+        user=parsed.username,
+        password=parsed.password,
+        sslmode='require',
+        **http_archive.db_options(),
+    )
+
+
+def coalesce(events):
+    """
+    Events -> (paths, categories). `categories` are those whose listing pages
+    changed; the site expands them into collection and guide pages.
+    """
+    by_business = {}
+    for e in events:
+        key = (e['categorySlug'], e['businessSlug'])
+        entry = by_business.setdefault(key, {'fields': set(), 'deleted': False})
+        entry['fields'].update(e['fields'] or [])
+        entry['deleted'] = entry['deleted'] or e['deleted']
+
+    paths = set()
+    categories = set()
+    for (category, slug), entry in by_business.items():
+        if not category:
+            continue
+        paths.add(f"/{category}/{slug}")
+        if entry['deleted'] or entry['fields'] & LISTING_FIELDS:
+            categories.add(category)
+            paths.add(f"/{category}")
+        if entry['deleted']:
+            paths.add('/sitemap.xml')
+
+    return sorted(paths), sorted(categories)
+
+
+def main():
+    print("Formby Guide — Drain change events")
+    print("=" * 60)
+
+    conn = connect_db()
+
+    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        events = http_archive.rows('change-events', cur, """
+            SELECT id, "businessSlug", "categorySlug", fields, deleted
+            FROM "ChangeEvent"
+            WHERE "drainedAt" IS NULL
+            ORDER BY "createdAt"
+            FOR UPDATE SKIP LOCKED
+        """)
+
+    if not events:
+        print("No pending change events")
+        conn.close()
+        return
+
+    paths, categories = coalesce(events)
+
+    print(f"Pending events:    {len(events)}")
+    print(f"Businesses:        {len({(e['categorySlug'], e['businessSlug']) for e in events})}")
+    print(f"Paths:             {len(paths)}")
+    print(f"Listing categories: {', '.join(categories) or '-'}")
+
+    with open(OUTPUT_FILE, 'w') as f:
+        json.dump({'paths': paths, 'categories': categories}, f, indent=2)
+    print(f"Saved to:          {OUTPUT_FILE}")
+
+    if REVALIDATE_URL and REVALIDATE_API_KEY:
+        try:
+            r = http_archive.session().post(
+                REVALIDATE_URL,
+                headers={'x-api-key': REVALIDATE_API_KEY},
+                json={'paths': paths, 'categories': categories},
+                timeout=30,
+            )
+            r.raise_for_status()
+            print(f"Revalidated:       {len(r.json().get('revalidated', []))} paths")
+        except http_archive.ReplayMiss:
+            raise
+        except Exception as e:
+            print(f"Revalidate error: {e} — events left pending")
+            conn.rollback()
+            conn.close()
+            exit(1)
+
+    with conn.cursor() as cur:
+        cur.execute(
+            'UPDATE "ChangeEvent" SET "drainedAt" = NOW() WHERE id = ANY(%s)',
+            ([e['id'] for e in events],),
+        )
+        cur.execute(
+            'DELETE FROM "ChangeEvent" WHERE "drainedAt" < NOW() - make_interval(days => %s)',
+            (KEEP_DRAINED_DAYS,),
+        )
+        pruned = cur.rowcount
+    conn.commit()
+    conn.close()
+
+    print(f"\nDrained {len(events)} events")
+    if pruned:
+        print(f"Pruned {pruned} events drained over {KEEP_DRAINED_DAYS} days ago")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,27 +6,52 @@ Fetches: phone, website, rating, review count, opening hours,
 
 Saves progress to enrich-progress.json — safe to interrupt and resume.
 
+Details are read through the shared place_id cache (places.DetailsCache),
+so runs for several regions fetch each place once. --regions limits the run
+to businesses in those regions (rows with no regions yet count as the
+default region) and names the right town in text searches.
+
+--bulk collects results and merges them BULK_BATCH at a time: COPY into a
+temporary staging table, then one set-based UPDATE with the same precedence
+rules as update_business(), closed-business deletes and change events, all
+in a single transaction. Prints how many rows changed per column.
+
 Usage:
-  python scripts/enrich-businesses.py
+  python scripts/enrich-businesses.py [--bulk] [--regions formby,southport] [--profile]
+                                      [--record FILE | --replay FILE]
 """
 
+import io
 import os
+import csv
 import json
-import time
-import requests
+import atexit
+import argparse
 import psycopg2
 import psycopg2.extras
-import re
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
+import http_archive
+import profiling
+from change_events import changed_fields_sql, delete_business
+from places import (
+    TRACKED_FIELDS, DetailsCache, enrichment_values, find_place, get_place_details, update_business,
+)
+from postcode_index import load_index
+from search_index import ensure_search_schema
+from service_area import DEFAULT_LAT, DEFAULT_LNG, DEFAULT_REGIONS, REGIONS, parse_regions
+
+profiling.install()
+http_archive.install()
+
 load_dotenv(".env.local")
 load_dotenv()
 
 API_KEY = os.getenv('GOOGLE_PLACES_API_KEY')
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-if not API_KEY:
+if not API_KEY and not http_archive.replaying():
     print("Error: GOOGLE_PLACES_API_KEY not set")
     exit(1)
 
@@ -36,22 +61,7 @@ if not DATABASE_URL:
 
 PROGRESS_FILE = 'enrich-progress.json'
 DELAY_BETWEEN = 0.35   # Seconds between API calls
-
-# Fields to fetch from Place Details
-DETAIL_FIELDS = ','.join([
-    'place_id',
-    'name',
-    'formatted_phone_number',
-    'international_phone_number',
-    'website',
-    'rating',
-    'user_ratings_total',
-    'price_level',
-    'opening_hours',
-    'formatted_address',
-    'business_status',
-    'editorial_summary',
-])
+BULK_BATCH = 500       # Rows per COPY merge in --bulk mode
 
 
 def connect_db():
@@ -63,6 +73,7 @@ def connect_db():
         user=parsed.username,
         password=parsed.password,
         sslmode='require',
+        **http_archive.db_options(),
     )
 
 
@@ -74,135 +85,173 @@ def load_progress():
 
 
 def save_progress(progress):
+    if http_archive.replaying():
+        return
     with open(PROGRESS_FILE, 'w') as f:
         json.dump(progress, f)
 
 
-def find_place(name, lat, lng):
-    """Find a place by name near Formby. Returns place_id or None."""
-    url = 'https://maps.googleapis.com/maps/api/place/findplacefromtext/json'
-    params = {
-        'input': f"{name} Formby",
-        'inputtype': 'textquery',
-        'fields': 'place_id,name',
-        'locationbias': f'circle:3000@{lat},{lng}',
-        'key': API_KEY,
-    }
-    try:
-        data = requests.get(url, params=params, timeout=10).json()
-        if data.get('status') == 'OK' and data.get('candidates'):
-            return data['candidates'][0]['place_id']
-    except Exception as e:
-        print(f"    find_place error: {e}")
-    return None
-
-
-def get_place_details(place_id):
-    """Fetch full details for a place."""
-    url = 'https://maps.googleapis.com/maps/api/place/details/json'
-    params = {
-        'place_id': place_id,
-        'fields': DETAIL_FIELDS,
-        'key': API_KEY,
-    }
-    try:
-        data = requests.get(url, params=params, timeout=10).json()
-        if data.get('status') == 'OK':
-            return data.get('result', {})
-    except Exception as e:
-        print(f"    place_details error: {e}")
-    return None
-
-
-def price_level_to_gbp(level):
-    if level is None:
-        return None
-    levels = ['Free', '£', '££', '£££', '££££']
-    try:
-        return levels[int(level)]
-    except (IndexError, TypeError):
-        return None
-
-
-def extract_postcode(formatted_address):
-    """Extract UK postcode from a formatted address string."""
-    pattern = r'[A-Z]{1,2}[0-9][0-9A-Z]?\s*[0-9][A-Z]{2}'
-    match = re.search(pattern, formatted_address or '', re.IGNORECASE)
-    if match:
-        return match.group().upper().strip()
-    return ''
-
-
-def update_business(conn, business_id, details, place_id):
-    phone = details.get('formatted_phone_number') or details.get('international_phone_number') or None
-    website = details.get('website') or None
-    rating = details.get('rating') or None
-    review_count = details.get('user_ratings_total') or None
-    price_range = price_level_to_gbp(details.get('price_level'))
-    business_status = details.get('business_status') or 'OPERATIONAL'
-    formatted_address = details.get('formatted_address') or None
-    postcode = extract_postcode(formatted_address) if formatted_address else ''
-    editorial_summary = (details.get('editorial_summary') or {}).get('overview') or None
-
-    opening_hours = None
-    if details.get('opening_hours'):
-        oh = details['opening_hours']
-        opening_hours = json.dumps({
-            'weekdayText': oh.get('weekday_text', []),
-            'openNow': oh.get('open_now'),
-            'periods': oh.get('periods', []),
-        })
+def town_for(biz):
+    """Town named in a text search: the row's first region, else the default region."""
+    regions = biz['regions'] or DEFAULT_REGIONS
+    return REGIONS.get(regions[0], REGIONS[DEFAULT_REGIONS[0]])['name']
+
 
+def fetch_details(place_id, cache):
+    """Place Details from the shared cache, or from the API (and then cached)."""
+    details = cache.get(place_id)
+    if details is None:
+        details = get_place_details(place_id)
+        http_archive.pause(DELAY_BETWEEN)
+        if details:
+            cache.put(place_id, details)
+    return details
+
+
+def locate(biz, postcodes):
+    """Best known (lat, lng) for a row: stored coords, then postcode centroid, then Formby."""
+    if biz['lat'] and biz['lng']:
+        return biz['lat'], biz['lng']
+    if postcodes and biz['postcode']:
+        centroid = postcodes.centroid(biz['postcode'])
+        if centroid:
+            return centroid
+    return DEFAULT_LAT, DEFAULT_LNG
+
+
+STAGING_TABLE_SQL = """
+    CREATE TEMP TABLE "BusinessEnrichStaging" (
+        "id"               text PRIMARY KEY,
+        "closed"           boolean NOT NULL,
+        "placeId"          text,
+        "phone"            text,
+        "website"          text,
+        "rating"           double precision,
+        "reviewCount"      integer,
+        "priceRange"       text,
+        "openingHours"     jsonb,
+        "address"          text,
+        "postcode"         text,
+        "shortDescription" text
+    ) ON COMMIT DROP
+"""
+STAGING_COLUMNS = ['id', 'closed'] + TRACKED_FIELDS
+
+
+@profiling.timed('bulk_merge')
+def bulk_merge(conn, rows, closed_ids):
+    """
+    Apply a batch of enrichment results in one transaction.
+    rows: dicts of {'id': ..., **enrichment_values()}. Returns {column: rows changed},
+    plus '_updated' and '_deleted' totals.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in rows:
+        writer.writerow([r['id'], 'f'] + [r[c] for c in TRACKED_FIELDS])
+    for biz_id in closed_ids:
+        writer.writerow([biz_id, 't'] + [None] * len(TRACKED_FIELDS))
+    buf.seek(0)
+
+    cols = ', '.join(f'"{c}"' for c in STAGING_COLUMNS)
     with conn.cursor() as cur:
+        # Private to this transaction: concurrent runs don't share it and db push never sees it
+        cur.execute(STAGING_TABLE_SQL)
+        # Unquoted empty CSV fields load as NULL, so empty strings keep existing values
+        cur.copy_expert(f'COPY "BusinessEnrichStaging" ({cols}) FROM STDIN WITH (FORMAT csv)', buf)
+
+        cur.execute(f"""
+            WITH old AS (
+                SELECT b.* FROM "Business" b
+                JOIN "BusinessEnrichStaging" s ON s.id = b.id AND NOT s.closed
+                FOR UPDATE OF b
+            ),
+            upd AS (
+                UPDATE "Business" b SET
+                    "placeId"       = s."placeId",
+                    "phone"         = COALESCE(s."phone", b."phone"),
+                    "website"       = COALESCE(s."website", b."website"),
+                    "rating"        = s."rating",
+                    "reviewCount"   = s."reviewCount",
+                    "priceRange"    = COALESCE(s."priceRange", b."priceRange"),
+                    "openingHours"  = COALESCE(s."openingHours", b."openingHours"),
+                    "address"       = COALESCE(s."address", b."address"),
+                    "postcode"      = CASE WHEN s."postcode" != '' THEN s."postcode" ELSE b."postcode" END,
+                    "shortDescription" = COALESCE(s."shortDescription", b."shortDescription"),
+                    "updatedAt"     = NOW()
+                FROM "BusinessEnrichStaging" s, old
+                WHERE b.id = s.id AND old.id = b.id
+                RETURNING b.slug,
+                          (SELECT slug FROM "Category" WHERE id = b."categoryId") AS category,
+                          {changed_fields_sql(TRACKED_FIELDS)} AS changed
+            ),
+            events AS (
+                INSERT INTO "ChangeEvent" ("id", "businessSlug", "categorySlug", "fields", "deleted", "source")
+                SELECT gen_random_uuid()::text, slug, category, changed, FALSE, 'enrich-businesses'
+                FROM upd WHERE cardinality(changed) > 0
+            )
+            SELECT f, COUNT(*) FROM upd, unnest(upd.changed) f GROUP BY f
+            UNION ALL
+            SELECT NULL, COUNT(*) FROM upd
+        """)
+        stats = {(field or '_updated'): count for field, count in cur.fetchall()}
+
         cur.execute("""
-            UPDATE "Business" SET
-                "placeId"       = %s,
-                "phone"         = COALESCE(%s, "phone"),
-                "website"       = COALESCE(%s, "website"),
-                "rating"        = %s,
-                "reviewCount"   = %s,
-                "priceRange"    = COALESCE(%s, "priceRange"),
-                "openingHours"  = CASE WHEN %s IS NOT NULL THEN %s::jsonb ELSE "openingHours" END,
-                "address"       = COALESCE(%s, "address"),
-                "postcode"      = CASE WHEN %s != '' THEN %s ELSE "postcode" END,
-                "shortDescription" = COALESCE(%s, "shortDescription"),
-                "updatedAt"     = NOW()
-            WHERE "id" = %s
-        """, (
-            place_id,
-            phone, website,
-            rating, review_count,
-            price_range,
-            opening_hours, opening_hours,
-            formatted_address,
-            postcode, postcode,
-            editorial_summary,
-            business_id,
-        ))
+            WITH gone AS (
+                DELETE FROM "Business" b USING "BusinessEnrichStaging" s
+                WHERE b.id = s.id AND s.closed
+                RETURNING b.slug, b."categoryId"
+            )
+            INSERT INTO "ChangeEvent" ("id", "businessSlug", "categorySlug", "fields", "deleted", "source")
+            SELECT gen_random_uuid()::text, gone.slug, c.slug, '{}', TRUE, 'enrich-businesses'
+            FROM gone LEFT JOIN "Category" c ON c.id = gone."categoryId"
+        """)
+        stats['_deleted'] = cur.rowcount
     conn.commit()
+    return stats
 
 
 def main():
-    print("Enriching Formby businesses with Google Place Details")
+    parser = argparse.ArgumentParser(description="Enrich businesses with Google Place Details")
+    parser.add_argument('--bulk', action='store_true', help=f"merge results {BULK_BATCH} rows at a time via COPY")
+    parser.add_argument('--regions', type=parse_regions,
+                        help=f"only businesses in these comma-separated regions ({', '.join(REGIONS)})")
+    args = parser.parse_args()
+
+    print("Enriching businesses with Google Place Details")
     print("=" * 60)
+    if args.regions:
+        print(f"Regions:              {', '.join(REGIONS[r]['name'] for r in args.regions)}")
 
-    progress = load_progress()
+    progress = http_archive.state('enrich-progress', load_progress)
     processed_ids = set(progress.get('processed', []))
     failed_ids = set(progress.get('failed', []))
 
     print(f"Previously processed: {len(processed_ids)}")
     print(f"Previously failed:    {len(failed_ids)}")
 
+    postcodes = load_index()
+    if postcodes:
+        print(f"Postcode index:       {len(postcodes)} postcodes")
+
+    cache = DetailsCache()
+    print(f"Details cache:        {len(cache.entries)} places ({cache.path})")
+    # Rewriting the whole file is O(cache size): only after bulk merges and once at exit
+    atexit.register(cache.save)
+
     conn = connect_db()
+    ensure_search_schema(conn)
     print("Connected to database")
 
     with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute("""
-            SELECT id, name, lat, lng, "placeId"
+        businesses = http_archive.rows('enrich-businesses', cur, """
+            SELECT id, name, lat, lng, postcode, "placeId", regions
             FROM "Business"
+            WHERE %(regions)s::text[] IS NULL
+               OR regions && %(regions)s::text[]
+               OR (COALESCE(cardinality(regions), 0) = 0 AND %(default)s::text[] && %(regions)s::text[])
             ORDER BY name
-        """)
-        businesses = cur.fetchall()
+        """, {'regions': args.regions, 'default': DEFAULT_REGIONS})
 
     total = len(businesses)
     to_process = [b for b in businesses if b['id'] not in processed_ids]
@@ -215,12 +264,39 @@ def main():
     start = t.time()
     processed_count = 0
     failed_count = 0
+    deleted_count = 0
+    pending, pending_closed = [], []
+    column_changes = {}
+
+    def flush():
+        nonlocal processed_count, failed_count, deleted_count
+        if not pending and not pending_closed:
+            return
+        batch_ids = [r['id'] for r in pending] + pending_closed
+        try:
+            stats = bulk_merge(conn, pending, pending_closed)
+            processed_count += stats.pop('_updated', 0)
+            deleted_count += stats.pop('_deleted', 0)
+            for field, count in stats.items():
+                column_changes[field] = column_changes.get(field, 0) + count
+            print(f"\n  --- Merged {len(batch_ids)} rows ---")
+        except Exception as e:
+            print(f"\n  Bulk merge error: {e}")
+            conn.rollback()
+            failed_ids.update(batch_ids)
+            failed_count += len(batch_ids)
+        processed_ids.update(batch_ids)
+        progress['processed'] = list(processed_ids)
+        progress['failed'] = list(failed_ids)
+        save_progress(progress)
+        pending.clear()
+        pending_closed.clear()
+        cache.save()
 
     for i, biz in enumerate(to_process):
         biz_id = biz['id']
         biz_name = biz['name']
-        lat = biz['lat'] or 53.5545
-        lng = biz['lng'] or -3.0716
+        lat, lng = locate(biz, postcodes)
         existing_place_id = biz['placeId']
 
         safe_name = biz_name.encode('ascii', 'replace').decode('ascii')
@@ -229,8 +305,8 @@ def main():
         # Get place_id if missing
         place_id = existing_place_id
         if not place_id:
-            place_id = find_place(biz_name, lat, lng)
-            time.sleep(DELAY_BETWEEN)
+            place_id = find_place(biz_name, lat, lng, town_for(biz))
+            http_archive.pause(DELAY_BETWEEN)
             if not place_id:
                 print(f"  Could not find place — skipping")
                 failed_ids.add(biz_id)
@@ -240,8 +316,7 @@ def main():
                 continue
 
         # Fetch details
-        details = get_place_details(place_id)
-        time.sleep(DELAY_BETWEEN)
+        details = fetch_details(place_id, cache)
 
         if not details:
             print(f"  Could not get details — skipping")
@@ -254,20 +329,39 @@ def main():
         # Remove permanently closed businesses
         if details.get('business_status') == 'CLOSED_PERMANENTLY':
             print(f"  PERMANENTLY CLOSED — removing")
+            if args.bulk:
+                pending_closed.append(biz_id)
+                if len(pending) + len(pending_closed) >= BULK_BATCH:
+                    flush()
+                continue
             with conn.cursor() as cur:
-                cur.execute('DELETE FROM "Business" WHERE id = %s', (biz_id,))
+                delete_business(cur, biz_id, 'enrich-businesses')
             conn.commit()
+            deleted_count += 1
             processed_ids.add(biz_id)
             progress['processed'] = list(processed_ids)
             save_progress(progress)
             continue
 
+        rating = details.get('rating', '-')
+        reviews = details.get('user_ratings_total', 0)
+        phone = details.get('formatted_phone_number', 'no phone')
+        # Only from stored coordinates — locate() may have fallen back to Formby's centre
+        fallback_postcode = ''
+        if postcodes and not biz['postcode'] and biz['lat'] and biz['lng']:
+            fallback_postcode = postcodes.nearest(biz['lat'], biz['lng'])
+
+        # Queue for the next bulk merge; marked processed once it commits
+        if args.bulk:
+            pending.append({'id': biz_id, **enrichment_values(details, place_id, fallback_postcode)})
+            print(f"  {rating}/5 ({reviews} reviews) | {phone}")
+            if len(pending) + len(pending_closed) >= BULK_BATCH:
+                flush()
+            continue
+
         # Update record
         try:
-            update_business(conn, biz_id, details, place_id)
-            rating = details.get('rating', '-')
-            reviews = details.get('user_ratings_total', 0)
-            phone = details.get('formatted_phone_number', 'no phone')
+            update_business(conn, biz_id, details, place_id, fallback_postcode)
             print(f"  {rating}/5 ({reviews} reviews) | {phone}")
             processed_count += 1
         except Exception as e:
@@ -287,6 +381,7 @@ def main():
             remaining = (len(to_process) - i - 1) / rate if rate > 0 else 0
             print(f"\n  --- Progress: {i+1}/{len(to_process)} | ETA: {remaining:.0f}s ---")
 
+    flush()
     save_progress(progress)
     conn.close()
 
@@ -294,7 +389,13 @@ def main():
     print(f"\n{'=' * 60}")
     print(f"COMPLETE in {elapsed:.0f}s")
     print(f"  Enriched:         {processed_count}")
+    print(f"  Removed (closed): {deleted_count}")
     print(f"  Failed/not found: {failed_count}")
+    print(f"  Details cached:   {cache.hits} (fetched {cache.misses})")
+    if args.bulk:
+        print(f"\n  Rows changed per column:")
+        for field in TRACKED_FIELDS:
+            print(f"    {field:<18}{column_changes.get(field, 0):>6}")
     print(f"\nNext: python scripts/cleanup-businesses.py")
 
 
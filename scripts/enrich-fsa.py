@@ -5,20 +5,44 @@ and store them against matching businesses in the database.
 
 Only runs for food-related categories: restaurants, cafes, pubs.
 
+Businesses are looked up CONCURRENCY at a time through the async client in
+fsa_client.py, which hedges the search strategies and rate-limits globally.
+
+--refresh re-checks ratings that may have changed since a previous run,
+without touching fsa-progress.json. Rows with an fhrsId are fetched directly
+by ID, and only when their local authority has published new data since the
+last refresh or their rating is older than REFRESH_RATING_AGE_DAYS. Name
+search is only used for rows with no fhrsId yet. An authority's mark only
+advances once every due establishment in it has been checked; fhrsIds whose
+lookup or save failed stay due until they succeed. After
+REFRESH_HOLD_ATTEMPTS failures in a row (e.g. an establishment removed from
+the FSA register, or re-registered under a new ID after a change of owner)
+the next failure clears the row's fhrsId, so it stops holding its authority
+back and goes back to name search. State lives in fsa-refresh.json.
+
 Usage:
-  python scripts/enrich-fsa.py
+  python scripts/enrich-fsa.py [--refresh] [--profile] [--record FILE | --replay FILE]
 """
 
 import os
 import json
-import time
 import re
-import requests
+import asyncio
+import argparse
+from datetime import datetime, timedelta
 import psycopg2
 import psycopg2.extras
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
+import http_archive
+import profiling
+from fsa_client import FsaClient, clear_fhrs_id, rating_value, save_rating
+from postcode_index import load_index
+
+profiling.install()
+http_archive.install()
+
 load_dotenv(".env.local")
 load_dotenv()
 
@@ -27,14 +51,14 @@ if not DATABASE_URL:
     print("Error: DATABASE_URL not set")
     exit(1)
 
-FSA_BASE = "https://api.ratings.food.gov.uk"
-FSA_HEADERS = {"x-api-version": "2", "Accept": "application/json"}
-DELAY = 0.5  # seconds between FSA calls
+CONCURRENCY = int(os.getenv("FSA_CONCURRENCY", "8"))  # Businesses in flight at once
 
 FOOD_CAT_SLUGS = {"restaurants", "cafes", "pubs"}
 
 PROGRESS_FILE = "fsa-progress.json"
-
+REFRESH_FILE = "fsa-refresh.json"
+REFRESH_RATING_AGE_DAYS = 365   # Re-check ratings at least this often regardless of authority updates
+REFRESH_HOLD_ATTEMPTS = 3       # Failed lookups that hold back their authority's mark
 
 def connect_db():
     parsed = urlparse(DATABASE_URL)
@@ -45,6 +69,7 @@ def connect_db():
         user=parsed.username,
         password=parsed.password,
         sslmode='require',
+        **http_archive.db_options(),
     )
 
 
@@ -56,21 +81,24 @@ def load_progress():
 
 
 def save_progress(prog):
+    if http_archive.replaying():
+        return
     with open(PROGRESS_FILE, "w") as f:
         json.dump(prog, f)
 
 
-def clean_name(name: str) -> str:
-    """Strip common suffixes to improve matching."""
-    suffixes = [
-        r"\s+(Ltd|Limited|LLP|PLC|& Co|and Co)\.?$",
-        r"\s+Formby$",
-        r"\s+Liverpool$",
-    ]
-    n = name
-    for s in suffixes:
-        n = re.sub(s, "", n, flags=re.IGNORECASE).strip()
-    return n
+def load_refresh_state():
+    if os.path.exists(REFRESH_FILE):
+        with open(REFRESH_FILE) as f:
+            return json.load(f)
+    return {"authorities": {}, "establishmentAuthority": {}, "retry": {}}
+
+
+def save_refresh_state(state):
+    if http_archive.replaying():
+        return
+    with open(REFRESH_FILE, "w") as f:
+        json.dump(state, f, indent=2)
 
 
 def extract_postcode(address: str) -> str:
@@ -78,89 +106,153 @@ def extract_postcode(address: str) -> str:
     return match.group().upper().strip() if match else ""
 
 
-def fsa_search(name: str, postcode: str) -> dict | None:
-    """
-    Search FSA for a business. Returns the best matching establishment dict or None.
-    Strategy:
-      1. Search by name + postcode (exact)
-      2. If no results, search by cleaned name only (first word of postcode area)
-    """
-    def search(params):
-        try:
-            r = requests.get(
-                f"{FSA_BASE}/Establishments",
-                headers=FSA_HEADERS,
-                params={**params, "pageSize": 10, "apiVersion": 2},
-                timeout=10,
-            )
-            if r.ok:
-                data = r.json()
-                return data.get("establishments", [])
-        except Exception as e:
-            print(f"    FSA error: {e}")
-        return []
-
-    # Try name + postcode
-    if postcode:
-        results = search({"name": name, "address": postcode})
-        if results:
-            return results[0]
-
-    # Try cleaned name + postcode area (e.g. "L37")
-    clean = clean_name(name)
-    pc_area = postcode.split()[0] if postcode else ""
-    if pc_area:
-        results = search({"name": clean, "address": pc_area})
-        if results:
-            return results[0]
-
-    # Last resort: just name search
-    results = search({"name": clean})
-    if results:
-        # Pick best match — same postcode area
-        if pc_area:
-            for r in results:
-                addr = (r.get("addressLine4") or "") + " " + (r.get("postCode") or "")
-                if pc_area.upper() in addr.upper():
-                    return r
-        return results[0]
-
-    return None
-
-
-def rating_value(establishment: dict) -> str | None:
-    """Extract a clean rating string: '5', '4', ... or 'Exempt', 'AwaitingInspection'."""
-    # FSA API returns PascalCase keys
-    rv = establishment.get("RatingValue") or establishment.get("ratingValue")
-    if rv is None:
-        return None
-    rv = str(rv).strip()
-    if rv in {"", "None", "null"}:
-        return None
-    return rv
+def resolve_postcode(biz, postcodes) -> str:
+    postcode = biz["postcode"] or extract_postcode(biz["address"] or "")
+    if not postcode and postcodes:
+        postcode = postcodes.nearest(biz["lat"], biz["lng"])
+    return postcode
+
+
+def refresh(conn, businesses, postcodes, failed_ids):
+    """Incremental re-check of existing ratings; see module docstring."""
+    state = http_archive.state('fsa-refresh', load_refresh_state)
+    known_authority = state["establishmentAuthority"]
+    retry = state.setdefault("retry", {})   # fhrsId -> consecutive failures
+    stale_before = http_archive.state('fsa-refresh-now', datetime.now) - timedelta(days=REFRESH_RATING_AGE_DAYS)
+
+    async def run():
+        async with FsaClient() as fsa:
+            published = await fsa.authorities()
+            if published:
+                updated = {code for code, date in published.items() if state["authorities"].get(code) != date}
+            else:
+                print("Could not fetch authority update times — checking every rated row")
+                updated = set(known_authority.values())
+
+            by_id, to_search = [], []
+            for biz in businesses:
+                fhrs_id = biz["fhrsId"]
+                if not fhrs_id:
+                    if biz["id"] not in failed_ids:
+                        to_search.append(biz)
+                elif (known_authority.get(fhrs_id) in updated or fhrs_id not in known_authority
+                      or fhrs_id in retry
+                      or not biz["hygieneRatingDate"] or biz["hygieneRatingDate"] < stale_before):
+                    by_id.append(biz)
+
+            print(f"Authorities with new data: {len(updated) if published else '?'}")
+            print(f"Due for direct lookup:     {len(by_id)}")
+            print(f"Without fhrsId (search):   {len(to_search)}")
+            print(f"Skipped as unchanged:      {len(businesses) - len(by_id) - len(to_search)}")
+            print("=" * 60)
+
+            limit = asyncio.Semaphore(CONCURRENCY)
+
+            async def lookup(biz):
+                async with limit:
+                    if biz["fhrsId"]:
+                        return biz, await fsa.establishment(biz["fhrsId"])
+                    return biz, await fsa.search(biz["name"], resolve_postcode(biz, postcodes))
+
+            counts = {"checked": 0, "missing": 0, "cleared": 0}
+            failed_authorities = set()
+
+            def failed(biz):
+                # Keep a direct lookup due, and hold back its authority's mark
+                fhrs_id = biz["fhrsId"]
+                if fhrs_id:
+                    retry[fhrs_id] = retry.get(fhrs_id, 0) + 1
+                    if retry[fhrs_id] <= REFRESH_HOLD_ATTEMPTS:
+                        failed_authorities.add(known_authority.get(fhrs_id))
+                        return
+                    # Still failing after the hold: drop the stale id and fall back to name search
+                    try:
+                        clear_fhrs_id(conn, biz["id"], fhrs_id)
+                    except Exception as e:
+                        print(f"  DB error clearing FSA ID={fhrs_id}: {e}")
+                        conn.rollback()
+                        return
+                    retry.pop(fhrs_id, None)
+                    known_authority.pop(fhrs_id, None)
+                    counts["cleared"] += 1
+
+            tasks = [asyncio.create_task(lookup(biz)) for biz in by_id + to_search]
+            for done in asyncio.as_completed(tasks):
+                biz, establishment = await done
+                safe = biz["name"].encode("ascii", "replace").decode("ascii")
+                if not establishment:
+                    print(f"  -- {safe}: not found in FSA")
+                    counts["missing"] += 1
+                    failed(biz)
+                    continue
+
+                fhrs_id = str(establishment.get("FHRSID") or "")
+                known_authority[fhrs_id] = str(establishment.get("LocalAuthorityCode") or "")
+                rv = rating_value(establishment)
+                try:
+                    save_rating(conn, biz["id"], rv, establishment.get("RatingDate") or None, fhrs_id)
+                    counts["checked"] += 1
+                    retry.pop(biz["fhrsId"], None)
+                    print(f"  OK {safe} | FSA ID={fhrs_id} | Rating={rv}")
+                except Exception as e:
+                    print(f"  DB error for {safe}: {e}")
+                    conn.rollback()
+                    failed(biz)
+
+            print(f"\n  FSA requests made: {fsa.requests}")
+            return published, counts, failed_authorities
+
+    published, counts, failed_authorities = asyncio.run(run())
+
+    # Only advance an authority's mark once every due row in it has been checked
+    for code, date in (published or {}).items():
+        if code not in failed_authorities:
+            state["authorities"][code] = date
+    save_refresh_state(state)
+
+    print(f"\n{'=' * 60}")
+    print(f"REFRESH COMPLETE")
+    print(f"  Ratings checked:  {counts['checked']}")
+    print(f"  Not found:        {counts['missing']}")
+    if counts["cleared"]:
+        print(f"  Stale FSA IDs cleared: {counts['cleared']}")
+    if failed_authorities:
+        print(f"  Authorities held back for retry: {len(failed_authorities)}")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Fetch FSA hygiene ratings for food businesses")
+    parser.add_argument("--refresh", action="store_true",
+                        help="re-check existing ratings by fhrsId instead of resuming the progress file")
+    args = parser.parse_args()
+
     print("Formby Guide — FSA Hygiene Rating Enrichment")
     print("=" * 60)
 
-    prog = load_progress()
+    prog = http_archive.state('fsa-progress', load_progress)
     processed_ids = set(prog.get("processed", []))
     failed_ids = set(prog.get("failed", []))
 
+    postcodes = load_index()
+
     conn = connect_db()
     print("Connected to database")
 
     # Fetch food-category businesses
     with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute("""
-            SELECT b.id, b.name, b.address, b.postcode, b."hygieneRating", c.slug AS cat_slug
+        businesses = http_archive.rows('fsa-businesses', cur, """
+            SELECT b.id, b.name, b.address, b.postcode, b.lat, b.lng, b."hygieneRating",
+                   b."hygieneRatingDate", b."fhrsId", c.slug AS cat_slug
             FROM "Business" b
             JOIN "Category" c ON c.id = b."categoryId"
             WHERE c.slug IN ('restaurants', 'cafes', 'pubs')
             ORDER BY b.name
         """)
-        businesses = cur.fetchall()
+
+    if args.refresh:
+        refresh(conn, businesses, postcodes, failed_ids)
+        conn.close()
+        return
 
     total = len(businesses)
     to_process = [b for b in businesses if b["id"] not in processed_ids]
@@ -173,27 +265,26 @@ def main():
     found = 0
     not_found = 0
 
-    for i, biz in enumerate(to_process):
-        biz_id = biz["id"]
-        name = biz["name"]
-        postcode = biz["postcode"] or extract_postcode(biz["address"] or "")
+    async def lookup(biz, limit, fsa):
+        postcode = resolve_postcode(biz, postcodes)
+        async with limit:
+            return biz, postcode, await fsa.search(biz["name"], postcode)
 
-        safe = name.encode("ascii", "replace").decode("ascii")
+    def handle(i, biz, postcode, establishment):
+        nonlocal found, not_found
+        biz_id = biz["id"]
+        safe = biz["name"].encode("ascii", "replace").decode("ascii")
         print(f"\n[{i+1}/{len(to_process)}] {safe} | {postcode}")
 
-        establishment = fsa_search(name, postcode)
-        time.sleep(DELAY)
-
         if not establishment:
             print(f"  -- Not found in FSA")
             failed_ids.add(biz_id)
             not_found += 1
-            prog["failed"] = list(failed_ids)
-            save_progress(prog)
             processed_ids.add(biz_id)
             prog["processed"] = list(processed_ids)
+            prog["failed"] = list(failed_ids)
             save_progress(prog)
-            continue
+            return
 
         rv = rating_value(establishment)
         fhrs_id = str(establishment.get("FHRSID") or "")
@@ -202,22 +293,7 @@ def main():
         print(f"  OK FSA ID={fhrs_id} | Rating={rv}")
 
         try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    UPDATE "Business" SET
-                        "hygieneRating"     = %s,
-                        "hygieneRatingDate" = %s,
-                        "hygieneRatingShow" = TRUE,
-                        "fhrsId"            = %s,
-                        "updatedAt"         = NOW()
-                    WHERE id = %s
-                """, (
-                    rv,
-                    rating_date_str,
-                    fhrs_id or None,
-                    biz_id,
-                ))
-            conn.commit()
+            save_rating(conn, biz_id, rv, rating_date_str, fhrs_id)
             found += 1
         except Exception as e:
             print(f"  DB error: {e}")
@@ -233,6 +309,16 @@ def main():
             save_progress(prog)
             print(f"\n  --- Progress {i+1}/{len(to_process)} | Found: {found} | Not found: {not_found} ---")
 
+    async def run():
+        limit = asyncio.Semaphore(CONCURRENCY)
+        async with FsaClient() as fsa:
+            tasks = [asyncio.create_task(lookup(biz, limit, fsa)) for biz in to_process]
+            for i, done in enumerate(asyncio.as_completed(tasks)):
+                handle(i, *await done)
+            print(f"\n  FSA requests made: {fsa.requests}")
+
+    asyncio.run(run())
+
     save_progress(prog)
     conn.close()
 
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Export visitor-facing business data as a static, versioned snapshot.
+
+Runs at the end of the pipeline. Writes one JSON-lines shard per category
+plus a slug -> (shard, offset, length) index (format in scripts/snapshot.py),
+so the site build and later pipeline runs can read listings locally.
+
+Incremental: only rows whose updatedAt is past the previous snapshot's
+high-water mark less HIGH_WATER_OVERLAP (or whose category changed, or
+that were deleted) are re-read, and only the shards where a record actually
+changed are rewritten. --full rebuilds everything.
+
+Writers set "updatedAt" = NOW(), the start of their transaction, so a write
+that commits after an export can carry an updatedAt below that export's
+mark; the overlap re-reads such rows on the next run.
+
+Usage:
+  python scripts/export-snapshot.py [--full] [--profile]
+"""
+
+import os
+import argparse
+from datetime import datetime, timedelta, timezone
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+from urllib.parse import urlparse
+
+import profiling
+from snapshot import FORMAT, SNAPSHOT_DIR, encode, load_snapshot, write_json_atomic
+
+profiling.install()
+load_dotenv(".env.local")
+load_dotenv()
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not set")
+    exit(1)
+
+HIGH_WATER_OVERLAP = timedelta(hours=1)   # Longest writer transaction the export allows for
+
+# Visitor-facing columns only — no owner, Stripe or internal fields
+RECORD_SQL = """
+    SELECT b.id, b.slug, b.name, c.slug AS category, c.name AS "categoryName",
+           b.address, b.postcode, b.lat, b.lng, b.phone, b.website,
+           b."shortDescription", b.description, b.images, b.tags,
+           b."openingHours", b."priceRange", b."listingTier", b.featured, b.claimed,
+           b.rating, b."reviewCount",
+           CASE WHEN b."hygieneRatingShow" THEN b."hygieneRating" END AS "hygieneRating",
+           CASE WHEN b."hygieneRatingShow" THEN b."hygieneRatingDate" END AS "hygieneRatingDate",
+           b."secondaryCategoryIds", b.regions, b."updatedAt"
+    FROM "Business" b
+    JOIN "Category" c ON c.id = b."categoryId"
+"""
+
+
+def connect_db():
+    parsed = urlparse(DATABASE_URL)
+    return psycopg2.connect(
+        host=parsed.hostname,
+        port=parsed.port or 5432,
+        database=parsed.path.lstrip('/'),
+        user=parsed.username,
+        password=parsed.password,
+        sslmode='require',
+    )
+
+
+def find_changes(cur, previous):
+    """
+    Compare the live table against the previous snapshot.
+    Returns (ids to re-read, slugs to drop, categories they leave, new high-water).
+    """
+    cur.execute("""
+        SELECT b.id, b.slug, c.slug AS category,
+               GREATEST(b."updatedAt", c."updatedAt") AS "updatedAt"
+        FROM "Business" b
+        JOIN "Category" c ON c.id = b."categoryId"
+    """)
+    live = cur.fetchall()
+
+    old_index = previous.index if previous else {}
+    high_water = None
+    if previous and previous.manifest['highWater']:
+        high_water = datetime.fromisoformat(previous.manifest['highWater'])
+
+    changed_ids = []
+    for row in live:
+        old = old_index.get(row['slug'])
+        if (old is None or old[0] != row['category'] or high_water is None
+                or row['updatedAt'] > high_water - HIGH_WATER_OVERLAP):
+            changed_ids.append(row['id'])
+
+    live_slugs = {row['slug'] for row in live}
+    dropped = [slug for slug in old_index if slug not in live_slugs]
+    dirty = {old_index[slug][0] for slug in dropped}
+
+    new_high_water = max((row['updatedAt'] for row in live), default=high_water)
+    return changed_ids, set(dropped), dirty, new_high_water
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a static business snapshot")
+    parser.add_argument('--full', action='store_true', help="rebuild every shard")
+    args = parser.parse_args()
+
+    print("Formby Guide — Snapshot export")
+    print("=" * 60)
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    current = load_snapshot()
+    previous = None if args.full else current
+    version = (current.version if current else 0) + 1
+
+    conn = connect_db()
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        changed_ids, dropped, dirty, high_water = find_changes(cur, previous)
+        changed = {}
+        if changed_ids:
+            cur.execute(RECORD_SQL + " WHERE b.id = ANY(%s)", (changed_ids,))
+            changed = {row['slug']: dict(row) for row in cur.fetchall()}
+    conn.close()
+
+    for slug, row in list(changed.items()):
+        old = previous.index.get(slug) if previous else None
+        # Rows re-read only for the overlap are usually byte-identical; leave their shard alone
+        if old and old[0] == row['category'] and previous.raw(slug) == encode(row):
+            del changed[slug]
+            continue
+        dirty.add(row['category'])
+        if old:
+            dirty.add(old[0])
+
+    print(f"Previous version:  {previous.version if previous else '-'}")
+    print(f"Changed rows:      {len(changed)}")
+    print(f"Deleted rows:      {len(dropped)}")
+    print(f"Shards to rewrite: {', '.join(sorted(dirty)) or '-'}")
+
+    if previous and not dirty:
+        print("\nSnapshot is up to date")
+        return
+
+    index = dict(previous.index) if previous else {}
+    shards = dict(previous.manifest['shards']) if previous else {}
+
+    for category in sorted(dirty):
+        # Carry over untouched records from the old shard as raw bytes
+        records = {}
+        if previous and category in previous.manifest['shards']:
+            for slug, (cat, _, _) in previous.index.items():
+                if cat == category and slug not in changed and slug not in dropped:
+                    records[slug] = previous.raw(slug)
+        for slug, row in changed.items():
+            if row['category'] == category:
+                records[slug] = encode(row)
+
+        for slug in [s for s, entry in index.items() if entry[0] == category]:
+            del index[slug]
+
+        if not records:
+            shards.pop(category, None)
+            continue
+
+        filename = f"{category}.v{version}.jsonl"
+        offset = 0
+        with open(os.path.join(SNAPSHOT_DIR, filename), 'wb') as f:
+            for slug in sorted(records):
+                data = records[slug]
+                f.write(data)
+                index[slug] = [category, offset, len(data)]
+                offset += len(data)
+        shards[category] = {'file': filename, 'count': len(records), 'bytes': offset}
+
+    index_file = f"index.v{version}.json"
+    write_json_atomic(os.path.join(SNAPSHOT_DIR, index_file), index)
+    write_json_atomic(os.path.join(SNAPSHOT_DIR, 'manifest.json'), {
+        'format': FORMAT,
+        'version': version,
+        'generatedAt': datetime.now(timezone.utc).isoformat(),
+        'highWater': high_water.isoformat() if high_water else None,
+        'index': index_file,
+        'shards': shards,
+    })
+
+    # Keep the previous version's files for readers still holding it open
+    keep = {'manifest.json', index_file, *(s['file'] for s in shards.values())}
+    if current:
+        keep.add(current.manifest['index'])
+        keep.update(s['file'] for s in current.manifest['shards'].values())
+        current.close()
+    for name in os.listdir(SNAPSHOT_DIR):
+        if name not in keep:
+            os.remove(os.path.join(SNAPSHOT_DIR, name))
+
+    print(f"\nWrote version {version}: {len(index)} businesses in {len(shards)} shards -> {SNAPSHOT_DIR}/")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+Async client for the Food Standards Agency ratings API.
+
+search() runs the three lookup strategies hedged: each one starts as soon
+as the previous one misses, or FSA_HEDGE_DELAY seconds after the previous
+one was actually sent if the rate limiter has a slot free right then. The
+rest are cancelled once a strategy earlier in the order has matched. Under
+load the limiter is busy, so strategies simply run in sequence and hedging
+never adds requests ahead of another business's first lookup. The answer
+is always the one the sequential order would give:
+  1. name + full postcode
+  2. cleaned name + postcode area (e.g. "L37")
+  3. cleaned name only, preferring a result in the same postcode area
+
+All requests from one client share a global rate limit (FSA_MAX_RPS).
+
+save_rating() and clear_fhrs_id() are the database side, shared by
+enrich-fsa.py and refresh-worker.py.
+"""
+
+import os
+import re
+import asyncio
+import time
+import json
+import aiohttp
+
+import http_archive
+from change_events import changed_fields_sql, record_change
+from profiling import atimed, timed
+
+FSA_BASE = "https://api.ratings.food.gov.uk"
+FSA_HEADERS = {"x-api-version": "2", "Accept": "application/json"}
+
+MAX_RPS = float(os.getenv("FSA_MAX_RPS", "4"))              # Global request rate
+HEDGE_DELAY = float(os.getenv("FSA_HEDGE_DELAY", "0.25"))   # Stagger between strategies
+TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# Columns save_rating() can change — diffed into the change-event outbox
+TRACKED_FIELDS = ["hygieneRating", "hygieneRatingDate", "hygieneRatingShow", "fhrsId"]
+
+
+def clean_name(name: str) -> str:
+    """Strip common suffixes to improve matching."""
+    suffixes = [
+        r"\s+(Ltd|Limited|LLP|PLC|& Co|and Co)\.?$",
+        r"\s+Formby$",
+        r"\s+Liverpool$",
+    ]
+    n = name
+    for s in suffixes:
+        n = re.sub(s, "", n, flags=re.IGNORECASE).strip()
+    return n
+
+
+def rating_value(establishment: dict) -> str | None:
+    """Extract a clean rating string: '5', '4', ... or 'Exempt', 'AwaitingInspection'."""
+    # FSA API returns PascalCase keys
+    rv = establishment.get("RatingValue") or establishment.get("ratingValue")
+    if rv is None:
+        return None
+    rv = str(rv).strip()
+    if rv in {"", "None", "null"}:
+        return None
+    return rv
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all tasks."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    def idle(self) -> bool:
+        """True if a call made now would not have to wait."""
+        return asyncio.get_running_loop().time() >= self._next
+
+    async def wait(self):
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = max(0.0, self._next - now)
+            self._next = max(now, self._next) + self.interval
+            slot_end = self._next
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Hand the slot back if nobody has queued behind it
+                if self._next == slot_end:
+                    self._next -= self.interval
+                raise
+
+
+def _first(results, pc_area):
+    return results[0]
+
+
+def _same_area(results, pc_area):
+    if pc_area:
+        for r in results:
+            addr = (r.get("addressLine4") or "") + " " + (r.get("postCode") or "")
+            if pc_area.upper() in addr.upper():
+                return r
+    return results[0]
+
+
+class FsaClient:
+    """Use as `async with FsaClient() as fsa:`."""
+
+    def __init__(self, max_rps: float = MAX_RPS, hedge_delay: float = HEDGE_DELAY):
+        self.limiter = RateLimiter(max_rps)
+        self.hedge_delay = hedge_delay
+        self.requests = 0
+        self._session = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(headers=FSA_HEADERS, timeout=TIMEOUT)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    async def _get_json(self, path: str, params: dict | None = None,
+                        sent: asyncio.Event | None = None) -> dict | None:
+        if http_archive.pacing():
+            await self.limiter.wait()
+        if sent:
+            sent.set()
+        self.requests += 1
+        url = f"{FSA_BASE}{path}"
+        key = http_archive.request_key("GET", url, params)
+        try:
+            if http_archive.replaying():
+                entry = await http_archive.alookup(key)
+                status, body = entry["status"], http_archive.body_of(entry)
+            else:
+                started = time.perf_counter()
+                async with self._session.get(url, params=params) as r:
+                    status, body = r.status, await r.read()
+                    if http_archive.recording():
+                        http_archive.record(key, status, r.headers, body, time.perf_counter() - started)
+            if status == 200:
+                return json.loads(body)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"    FSA error: {e}")
+        return None
+
+    async def _establishments(self, params: dict, sent: asyncio.Event | None = None) -> list:
+        data = await self._get_json(
+            "/Establishments",
+            {**params, "pageSize": "10", "apiVersion": "2"},
+            sent,
+        )
+        return (data or {}).get("establishments", [])
+
+    @atimed('fsa_establishment')
+    async def establishment(self, fhrs_id: str) -> dict | None:
+        """Direct lookup of one establishment by its FHRSID."""
+        return await self._get_json(f"/Establishments/{fhrs_id}")
+
+    async def authorities(self) -> dict:
+        """Local authority code -> LastPublishedDate of its ratings data."""
+        data = await self._get_json("/Authorities")
+        return {
+            str(a.get("LocalAuthorityIdCode")): a.get("LastPublishedDate")
+            for a in (data or {}).get("authorities", [])
+        }
+
+    @atimed('fsa_search')
+    async def search(self, name: str, postcode: str) -> dict | None:
+        """Best matching establishment dict or None (see module docstring for order)."""
+        clean = clean_name(name)
+        pc_area = postcode.split()[0] if postcode else ""
+
+        strategies = []
+        if postcode:
+            strategies.append(({"name": name, "address": postcode}, _first))
+        if pc_area:
+            strategies.append(({"name": clean, "address": pc_area}, _first))
+        strategies.append(({"name": clean}, _same_area))
+
+        sent = [asyncio.Event() for _ in strategies]
+        missed = [asyncio.Event() for _ in strategies]
+
+        async def attempt(k, params):
+            if k:
+                # The stagger starts once the previous strategy is on the wire
+                await sent[k - 1].wait()
+                try:
+                    await asyncio.wait_for(missed[k - 1].wait(), self.hedge_delay)
+                except asyncio.TimeoutError:
+                    # Only hedge into spare capacity; otherwise wait for the miss
+                    if http_archive.pacing() and not self.limiter.idle():
+                        await missed[k - 1].wait()
+            results = await self._establishments(params, sent[k])
+            if not results:
+                missed[k].set()
+            return results
+
+        tasks = [asyncio.create_task(attempt(k, params)) for k, (params, _) in enumerate(strategies)]
+        try:
+            for task, (_, pick) in zip(tasks, strategies):
+                results = await task
+                if results:
+                    return pick(results, pc_area)
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@timed('save_rating')
+def save_rating(conn, biz_id, rv, rating_date_str, fhrs_id, source="enrich-fsa"):
+    """
+    Store an FSA result and commit, queueing a change event if anything visible moved.
+    Returns the list of columns that changed.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            WITH old AS (
+                SELECT * FROM "Business" WHERE id = %s FOR UPDATE
+            )
+            UPDATE "Business" b SET
+                "hygieneRating"     = %s,
+                "hygieneRatingDate" = %s,
+                "hygieneRatingShow" = TRUE,
+                "fhrsId"            = %s,
+                "updatedAt"         = NOW()
+            FROM old
+            WHERE b.id = old.id
+            RETURNING b.slug,
+                      (SELECT slug FROM "Category" WHERE id = b."categoryId"),
+                      {changed_fields_sql(TRACKED_FIELDS)}
+        """, (
+            biz_id,
+            rv,
+            rating_date_str,
+            fhrs_id or None,
+        ))
+        row = cur.fetchone()
+        if row and row[2]:
+            record_change(cur, row[0], row[1], row[2], source)
+    conn.commit()
+    return row[2] if row else []
+
+
+@timed('clear_fhrs_id')
+def clear_fhrs_id(conn, biz_id, fhrs_id, source="enrich-fsa"):
+    """
+    Forget an fhrsId that no longer resolves, so the row is matched by name
+    search again. Commits; a no-op if the row has since moved to another id.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE "Business" b SET "fhrsId" = NULL, "updatedAt" = NOW()
+            WHERE b.id = %s AND b."fhrsId" = %s
+            RETURNING b.slug, (SELECT slug FROM "Category" WHERE id = b."categoryId")
+        """, (biz_id, fhrs_id))
+        row = cur.fetchone()
+        if row:
+            record_change(cur, row[0], row[1], ['fhrsId'], source)
+    conn.commit()
+    return row is not None
@@ -0,0 +1,289 @@
+"""
+Record-and-replay transport for the pipeline's HTTP calls.
+
+Any script that calls install() accepts:
+
+  --record FILE          do the run live and save every request/response to FILE
+  --replay FILE          serve every request from FILE, no network; as fast as possible
+  --replay-latency       with --replay, wait each response's recorded latency
+
+Archives are gzipped JSON lines, one exchange per line. Secret query
+parameters (key, apikey, ...) and headers are dropped before anything is
+written and are ignored when matching, so an archive is safe to share
+and replays without API keys configured. Identical requests are replayed
+in the order recorded; once those run out, the last response is reused.
+
+requests-based calls go through session(); the aiohttp FSA client calls
+lookup()/record() around its own requests.
+
+A replay is a dry run that makes the recording's requests in the same order:
+  - connections opened with db_options() roll back on every commit(), so
+    nothing is written and no ChangeEvents are queued
+  - run state (progress files, scrape yield stats, ...) is read through
+    state(), and the database rows that decide which requests are made
+    through rows(): a recording stores what it started from and a replay
+    starts from that copy, not from files and rows the recording has since
+    changed; scripts skip saving state files while replaying
+  - ReplayMiss must never be swallowed by a script's error handling — a
+    request the recording did not make means the replay has diverged
+"""
+
+import sys
+import gzip
+import json
+import time
+import base64
+import atexit
+import asyncio
+import threading
+from collections import defaultdict, deque
+from datetime import date, datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+SECRET_PARAMS = {'key', 'apikey', 'api_key', 'token', 'access_token'}
+KEPT_HEADERS = {'content-type', 'location'}
+
+_mode = None          # None, 'record' or 'replay'
+_with_latency = False
+_archive = None
+
+
+class ReplayMiss(Exception):
+    """A request in replay mode that the archive has no response for. Never catch it."""
+
+
+def request_key(method, url, params=None):
+    """Canonical, secret-free identity of a request: METHOD url?sorted-query."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(k, str(v)) for k, v in params.items() if v is not None]
+    query = sorted((k, v) for k, v in query if k.lower() not in SECRET_PARAMS)
+    return f"{method.upper()} {urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))}"
+
+
+def _encode(value):
+    # Dates in recorded rows round-trip as {"$datetime": iso} / {"$date": iso}
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    raise TypeError(f"cannot archive {type(value).__name__}")
+
+
+def _decode(obj):
+    if obj.keys() == {'$datetime'}:
+        return datetime.fromisoformat(obj['$datetime'])
+    if obj.keys() == {'$date'}:
+        return date.fromisoformat(obj['$date'])
+    return obj
+
+
+class Archive:
+    def __init__(self, path, mode):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = defaultdict(deque)
+        self.states = {}
+        self.last = {}
+        self.count = 0
+        if mode == 'record':
+            self._out = gzip.open(path, 'wt', encoding='utf-8')
+        else:
+            self._out = None
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line, object_hook=_decode)
+                    if 'state' in entry:
+                        self.states[entry['key']] = entry['state']
+                    else:
+                        self.entries[entry['key']].append(entry)
+
+    def record(self, key, status, headers, body, elapsed):
+        try:
+            text, encoding = body.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            text, encoding = base64.b64encode(body).decode('ascii'), 'base64'
+        entry = {
+            'key': key,
+            'status': status,
+            'headers': {k.lower(): v for k, v in headers.items() if k.lower() in KEPT_HEADERS},
+            'body': text,
+            'encoding': encoding,
+            'elapsed': round(elapsed, 4),
+        }
+        with self.lock:
+            self._out.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self.count += 1
+
+    def record_state(self, name, data):
+        with self.lock:
+            self._out.write(json.dumps({'key': f'STATE {name}', 'state': data},
+                                       separators=(',', ':'), default=_encode) + '\n')
+
+    def take(self, key):
+        with self.lock:
+            queue = self.entries.get(key)
+            if queue:
+                self.last[key] = queue.popleft()
+            if key not in self.last:
+                raise ReplayMiss(key)
+            self.count += 1
+            return self.last[key]
+
+    def close(self):
+        if self._out:
+            self._out.close()
+
+
+def body_of(entry):
+    if entry['encoding'] == 'base64':
+        return base64.b64decode(entry['body'])
+    return entry['body'].encode('utf-8')
+
+
+def install():
+    """Strip --record/--replay/--replay-latency from argv and activate the archive."""
+    global _mode, _with_latency, _archive
+    argv = sys.argv
+    for flag, mode in (('--record', 'record'), ('--replay', 'replay')):
+        if flag in argv:
+            i = argv.index(flag)
+            path = argv[i + 1]
+            del argv[i:i + 2]
+            _mode = mode
+            _archive = Archive(path, mode)
+    if '--replay-latency' in argv:
+        argv.remove('--replay-latency')
+        _with_latency = True
+
+    if _archive:
+        def finish():
+            _archive.close()
+            verb = 'Recorded' if _mode == 'record' else 'Replayed'
+            print(f"\n{verb} {_archive.count} HTTP exchanges ({_archive.path})")
+        atexit.register(finish)
+
+
+def recording():
+    return _mode == 'record'
+
+
+def replaying():
+    return _mode == 'replay'
+
+
+def pacing():
+    """False when replaying at full speed — politeness delays can be skipped."""
+    return not (replaying() and not _with_latency)
+
+
+def pause(seconds):
+    """time.sleep() for API politeness delays; a no-op in full-speed replay."""
+    if pacing():
+        time.sleep(seconds)
+
+
+def state(name, load):
+    """
+    Run state a script resumes from, e.g. state('enrich-progress', load_progress).
+    Recorded on --record; on --replay the recorded copy is returned instead of
+    calling load(), so the replay schedules the same requests.
+    """
+    if replaying():
+        key = f'STATE {name}'
+        if key not in _archive.states:
+            raise ReplayMiss(key)
+        return _archive.states[key]
+    data = load()
+    if recording():
+        _archive.record_state(name, data)
+    return data
+
+
+def rows(name, cur, sql, params=None):
+    """
+    cur.execute(sql, params) as a list of dicts, archived like state(): a replay
+    gets the rows the recording selected, whatever the recording then wrote.
+    """
+    def load():
+        cur.execute(sql, params)
+        return [dict(row) for row in cur.fetchall()]
+    return state(name, load)
+
+
+_replay_connection = None
+
+
+def db_options():
+    """
+    Extra psycopg2.connect() kwargs. While replaying, the connection's commit()
+    rolls back instead, so a replay reads the live database but never changes it.
+    """
+    global _replay_connection
+    if not replaying():
+        return {}
+    if _replay_connection is None:
+        import psycopg2.extensions
+
+        class ReplayConnection(psycopg2.extensions.connection):
+            def commit(self):
+                self.rollback()
+
+        _replay_connection = ReplayConnection
+    return {'connection_factory': _replay_connection}
+
+
+def lookup(key):
+    """Replay-mode response for a request key (raises ReplayMiss)."""
+    entry = _archive.take(key)
+    if _with_latency:
+        time.sleep(entry['elapsed'])
+    return entry
+
+
+async def alookup(key):
+    entry = _archive.take(key)
+    if _with_latency:
+        await asyncio.sleep(entry['elapsed'])
+    return entry
+
+
+def record(key, status, headers, body, elapsed):
+    _archive.record(key, status, headers, body, elapsed)
+
+
+class ArchiveAdapter(HTTPAdapter):
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url)
+        if replaying():
+            entry = lookup(key)
+            response = requests.Response()
+            response.status_code = entry['status']
+            response.headers = CaseInsensitiveDict(entry['headers'])
+            response._content = body_of(entry)
+            response.encoding = 'utf-8'
+            response.url = request.url
+            response.request = request
+            return response
+
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        if recording():
+            record(key, response.status_code, response.headers, response.content,
+                   time.perf_counter() - started)
+        return response
+
+
+def session():
+    """A requests.Session that records/replays when --record/--replay is active."""
+    s = requests.Session()
+    if _mode:
+        adapter = ArchiveAdapter()
+        s.mount('http://', adapter)
+        s.mount('https://', adapter)
+    return s
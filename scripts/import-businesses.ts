@@ -4,6 +4,10 @@
  * Usage: npm run import-businesses
  *
  * Run scrape-businesses.py first to generate the CSV.
+ *
+ * Rows are matched to existing businesses by Google place_id. Chains have
+ * branches in several towns, so a new business whose name slug is already
+ * taken by a different place gets the region appended (costa-coffee-southport).
  */
 
 import "dotenv/config";
@@ -18,6 +22,7 @@ const adapter = new PrismaPg({ connectionString });
 const prisma = new PrismaClient({ adapter });
 
 interface CSVRow {
+  place_id?: string;
   name: string;
   category: string;
   address: string;
@@ -27,6 +32,7 @@ interface CSVRow {
   phone: string;
   website: string;
   price_range: string;
+  regions?: string;
 }
 
 function slugify(text: string): string {
@@ -36,6 +42,50 @@ function slugify(text: string): string {
     .replace(/^-+|-+$/g, "");
 }
 
+function parseRegions(regions: string | undefined): string[] {
+  return (regions || "").split(";").map((r) => r.trim()).filter(Boolean);
+}
+
+// Region assumed for rows imported before businesses had regions
+const DEFAULT_REGION = "formby";
+
+type SlugHolder = { id: string; placeId: string | null; regions: string[] };
+
+/**
+ * Whether an existing row holding this slug is the CSV row's business: the
+ * same place_id, or — for rows not yet enriched or CSVs without place_id —
+ * no place_id to tell them apart and an overlapping region.
+ */
+function sameListing(holder: SlugHolder, placeId: string | undefined, regions: string[]): boolean {
+  if (holder.placeId && placeId) return holder.placeId === placeId;
+  const held = holder.regions.length ? holder.regions : [DEFAULT_REGION];
+  const wanted = regions.length ? regions : [DEFAULT_REGION];
+  return held.some((r) => wanted.includes(r));
+}
+
+/** Existing business id for a CSV row, or a free slug to create it under. */
+async function resolveListing(
+  baseSlug: string,
+  placeId: string | undefined,
+  regions: string[],
+): Promise<{ id: string } | { slug: string }> {
+  if (placeId) {
+    const byPlace = await prisma.business.findFirst({ where: { placeId }, select: { id: true } });
+    if (byPlace) return byPlace;
+  }
+
+  const region = regions[0] ?? DEFAULT_REGION;
+  for (let n = 1; ; n++) {
+    const slug = n === 1 ? baseSlug : n === 2 ? `${baseSlug}-${region}` : `${baseSlug}-${region}-${n - 1}`;
+    const holder = await prisma.business.findUnique({
+      where: { slug },
+      select: { id: true, placeId: true, regions: true },
+    });
+    if (!holder) return { slug };
+    if (sameListing(holder, placeId, regions)) return { id: holder.id };
+  }
+}
+
 function parsePriceRange(priceRange: string): string | undefined {
   if (!priceRange) return undefined;
   const level = parseInt(priceRange);
@@ -68,6 +118,9 @@ async function main() {
   const categoryMap = new Map(categories.map((c) => [c.slug, c.id]));
   console.log(`Known categories: ${[...categoryMap.keys()].join(", ")}\n`);
 
+  // Rows from before the regions column was added hold NULL; give them the column default
+  await prisma.$executeRaw`UPDATE "Business" SET regions = '{}' WHERE regions IS NULL`;
+
   let imported = 0;
   let skipped = 0;
 
@@ -84,40 +137,51 @@ async function main() {
       continue;
     }
 
-    const slug = slugify(row.name);
-    if (!slug) {
+    const baseSlug = slugify(row.name);
+    if (!baseSlug) {
       console.warn(`  Skip "${row.name}": could not generate slug`);
       skipped++;
       continue;
     }
 
+    const placeId = row.place_id || undefined;
+    const regions = parseRegions(row.regions);
+
     try {
-      await prisma.business.upsert({
-        where: { slug },
-        create: {
-          slug,
-          name: row.name,
-          categoryId,
-          address: row.address || "Formby",
-          postcode: row.postcode || "",
-          lat: row.lat ? parseFloat(row.lat) : null,
-          lng: row.lng ? parseFloat(row.lng) : null,
-          phone: row.phone || null,
-          website: row.website || null,
-          priceRange: parsePriceRange(row.price_range),
-          images: [],
-        },
-        update: {
-          name: row.name,
-          address: row.address || "Formby",
-          postcode: row.postcode || "",
-          lat: row.lat ? parseFloat(row.lat) : null,
-          lng: row.lng ? parseFloat(row.lng) : null,
-          phone: row.phone || null,
-          website: row.website || null,
-          priceRange: parsePriceRange(row.price_range),
-        },
-      });
+      const listing = await resolveListing(baseSlug, placeId, regions);
+      const fields = {
+        name: row.name,
+        address: row.address || "Formby",
+        postcode: row.postcode || "",
+        lat: row.lat ? parseFloat(row.lat) : null,
+        lng: row.lng ? parseFloat(row.lng) : null,
+        phone: row.phone || null,
+        website: row.website || null,
+        priceRange: parsePriceRange(row.price_range),
+      };
+
+      if ("id" in listing) {
+        await prisma.business.update({
+          where: { id: listing.id },
+          data: {
+            ...fields,
+            ...(placeId !== undefined && { placeId }),
+            // CSVs from before the regions column leave existing assignments alone
+            ...(row.regions !== undefined && { regions }),
+          },
+        });
+      } else {
+        await prisma.business.create({
+          data: {
+            ...fields,
+            slug: listing.slug,
+            categoryId,
+            placeId: placeId ?? null,
+            regions,
+            images: [],
+          },
+        });
+      }
       imported++;
       if (imported % 25 === 0) {
         console.log(`  Imported ${imported}...`);
@@ -0,0 +1,275 @@
+"""
+Google Places lookups and the Business columns they feed.
+
+Shared by enrich-businesses.py (one-shot enrichment) and refresh-worker.py
+(scheduled per-business refreshes). Requests go through http_archive, so
+enrich-businesses.py's --record/--replay cover them; the session is created
+on first use, after the calling script has run http_archive.install().
+
+DetailsCache is a place_id-keyed store of Place Details responses on disk
+(PLACE_DETAILS_CACHE, default place-details-cache.json). Enrichment runs
+for different regions share it, so a place on a border is fetched once
+per PLACE_DETAILS_TTL_HOURS however many towns list it. Recording and
+replaying runs bypass it (a replay never writes it).
+"""
+
+import os
+import re
+import json
+import time
+
+import http_archive
+import profiling
+from change_events import changed_fields_sql, record_change
+
+PLACES_BASE = 'https://maps.googleapis.com/maps/api/place'
+PHOTO_MAX_WIDTH = 800
+
+# Fields to fetch from Place Details
+DETAIL_FIELDS = ','.join([
+    'place_id',
+    'name',
+    'formatted_phone_number',
+    'international_phone_number',
+    'website',
+    'rating',
+    'user_ratings_total',
+    'price_level',
+    'opening_hours',
+    'formatted_address',
+    'business_status',
+    'editorial_summary',
+])
+
+# Columns update_business() can change — diffed into the change-event outbox
+TRACKED_FIELDS = [
+    'placeId', 'phone', 'website', 'rating', 'reviewCount', 'priceRange',
+    'openingHours', 'address', 'postcode', 'shortDescription',
+]
+
+DEFAULT_DETAILS_CACHE = 'place-details-cache.json'
+DEFAULT_DETAILS_TTL_HOURS = 24
+
+_http = None
+
+
+def _session():
+    global _http
+    if _http is None:
+        _http = http_archive.session()
+    return _http
+
+
+def _key():
+    return os.getenv('GOOGLE_PLACES_API_KEY')
+
+
+@profiling.timed('find_place')
+def find_place(name, lat, lng, town='Formby'):
+    """Find a place by name near a town. Returns place_id or None."""
+    params = {
+        'input': f"{name} {town}",
+        'inputtype': 'textquery',
+        'fields': 'place_id,name',
+        'locationbias': f'circle:3000@{lat},{lng}',
+        'key': _key(),
+    }
+    try:
+        data = _session().get(f'{PLACES_BASE}/findplacefromtext/json', params=params, timeout=10).json()
+        if data.get('status') == 'OK' and data.get('candidates'):
+            return data['candidates'][0]['place_id']
+    except http_archive.ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"    find_place error: {e}")
+    return None
+
+
+@profiling.timed('get_place_details')
+def get_place_details(place_id, fields=DETAIL_FIELDS):
+    """Fetch full details for a place."""
+    params = {
+        'place_id': place_id,
+        'fields': fields,
+        'key': _key(),
+    }
+    try:
+        data = _session().get(f'{PLACES_BASE}/details/json', params=params, timeout=10).json()
+        if data.get('status') == 'OK':
+            return data.get('result', {})
+    except http_archive.ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"    place_details error: {e}")
+    return None
+
+
+@profiling.timed('get_photo_url')
+def get_photo_url(place_id):
+    """
+    CDN URL of a place's first photo (no API key in it), as fetch-place-photos.mjs
+    stores it. Returns None if the place has no photos or the lookup failed.
+    """
+    details = get_place_details(place_id, fields='photos')
+    photos = (details or {}).get('photos') or []
+    if not photos:
+        return None
+    params = {
+        'maxwidth': PHOTO_MAX_WIDTH,
+        'photo_reference': photos[0]['photo_reference'],
+        'key': _key(),
+    }
+    try:
+        r = _session().get(f'{PLACES_BASE}/photo', params=params, timeout=10, allow_redirects=False)
+        return r.headers.get('location') or None
+    except http_archive.ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"    photo error: {e}")
+    return None
+
+
+class DetailsCache:
+    """place_id -> Place Details, with the time each was fetched. Call save() to persist."""
+
+    def __init__(self, path=None, ttl_hours=None):
+        self.path = path or os.getenv('PLACE_DETAILS_CACHE', DEFAULT_DETAILS_CACHE)
+        self.ttl = 3600 * (ttl_hours if ttl_hours is not None
+                           else float(os.getenv('PLACE_DETAILS_TTL_HOURS', DEFAULT_DETAILS_TTL_HOURS)))
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        # Recording/replaying runs skip the cache so every lookup is an archived request
+        self.bypass = http_archive.recording() or http_archive.replaying()
+        if os.path.exists(self.path) and not self.bypass:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    def get(self, place_id):
+        """Cached details if fetched within the TTL, else None."""
+        entry = None if self.bypass else self.entries.get(place_id)
+        if entry and time.time() - entry['fetchedAt'] < self.ttl:
+            self.hits += 1
+            return entry['details']
+        self.misses += 1
+        return None
+
+    def put(self, place_id, details):
+        self.entries[place_id] = {'fetchedAt': time.time(), 'details': details}
+
+    def save(self):
+        """Write the cache atomically, dropping expired entries."""
+        if http_archive.replaying():
+            return
+        cutoff = time.time() - self.ttl
+        self.entries = {k: e for k, e in self.entries.items() if e['fetchedAt'] >= cutoff}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, separators=(',', ':'))
+        os.replace(tmp, self.path)
+
+
+def price_level_to_gbp(level):
+    if level is None:
+        return None
+    levels = ['Free', '£', '££', '£££', '££££']
+    try:
+        return levels[int(level)]
+    except (IndexError, TypeError):
+        return None
+
+
+def extract_postcode(formatted_address):
+    """Extract UK postcode from a formatted address string."""
+    pattern = r'[A-Z]{1,2}[0-9][0-9A-Z]?\s*[0-9][A-Z]{2}'
+    match = re.search(pattern, formatted_address or '', re.IGNORECASE)
+    if match:
+        return match.group().upper().strip()
+    return ''
+
+
+def enrichment_values(details, place_id, fallback_postcode=''):
+    """Place Details -> column values, before the COALESCE/CASE precedence rules are applied."""
+    formatted_address = details.get('formatted_address') or None
+
+    opening_hours = None
+    if details.get('opening_hours'):
+        oh = details['opening_hours']
+        opening_hours = json.dumps({
+            'weekdayText': oh.get('weekday_text', []),
+            'openNow': oh.get('open_now'),
+            'periods': oh.get('periods', []),
+        })
+
+    return {
+        'placeId':          place_id,
+        'phone':            details.get('formatted_phone_number') or details.get('international_phone_number') or None,
+        'website':          details.get('website') or None,
+        'rating':           details.get('rating') or None,
+        'reviewCount':      details.get('user_ratings_total') or None,
+        'priceRange':       price_level_to_gbp(details.get('price_level')),
+        'openingHours':     opening_hours,
+        'address':          formatted_address,
+        'postcode':         (extract_postcode(formatted_address) if formatted_address else '') or fallback_postcode,
+        'shortDescription': (details.get('editorial_summary') or {}).get('overview') or None,
+    }
+
+
+@profiling.timed('update_business')
+def update_business(conn, business_id, details, place_id, fallback_postcode='', source='enrich-businesses'):
+    """Apply Place Details to one row and commit. Returns the list of columns that changed."""
+    v = enrichment_values(details, place_id, fallback_postcode)
+
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            WITH old AS (
+                SELECT * FROM "Business" WHERE "id" = %s FOR UPDATE
+            )
+            UPDATE "Business" b SET
+                "placeId"       = %s,
+                "phone"         = COALESCE(%s, b."phone"),
+                "website"       = COALESCE(%s, b."website"),
+                "rating"        = %s,
+                "reviewCount"   = %s,
+                "priceRange"    = COALESCE(%s, b."priceRange"),
+                "openingHours"  = CASE WHEN %s IS NOT NULL THEN %s::jsonb ELSE b."openingHours" END,
+                "address"       = COALESCE(%s, b."address"),
+                "postcode"      = CASE WHEN %s != '' THEN %s ELSE b."postcode" END,
+                "shortDescription" = COALESCE(%s, b."shortDescription"),
+                "updatedAt"     = NOW()
+            FROM old
+            WHERE b."id" = old."id"
+            RETURNING b."slug",
+                      (SELECT "slug" FROM "Category" WHERE "id" = b."categoryId"),
+                      {changed_fields_sql(TRACKED_FIELDS)}
+        """, (
+            business_id,
+            v['placeId'],
+            v['phone'], v['website'],
+            v['rating'], v['reviewCount'],
+            v['priceRange'],
+            v['openingHours'], v['openingHours'],
+            v['address'],
+            v['postcode'], v['postcode'],
+            v['shortDescription'],
+        ))
+        row = cur.fetchone()
+        if row and row[2]:
+            record_change(cur, row[0], row[1], row[2], source)
+    conn.commit()
+    return row[2] if row else []
+
+
+def update_photo(conn, business_id, url, source):
+    """Point images at a fresh Google CDN URL and commit. Returns True if it changed."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE "Business" b SET "images" = ARRAY[%s], "updatedAt" = NOW()
+            WHERE b.id = %s AND b."images" IS DISTINCT FROM ARRAY[%s]
+            RETURNING b.slug, (SELECT slug FROM "Category" WHERE id = b."categoryId")
+        """, (url, business_id, url))
+        row = cur.fetchone()
+        if row:
+            record_change(cur, row[0], row[1], ['images'], source)
+    conn.commit()
+    return row is not None
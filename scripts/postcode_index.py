@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Offline UK postcode index built from an ONS Postcode Directory extract.
+
+Lets the scraper and enrichers fill in postcodes and coordinates locally
+instead of spending a billed Google lookup on them.
+
+The index is a single binary file that is mmap'd on load:
+
+  header   8-byte magic + uint32 record count + uint32 padding
+  records  sorted by postcode: 8-byte postcode (no space), float64 lat, float64 lng
+  by_lat   uint32 record numbers sorted by latitude (for nearest-centroid search)
+
+Usage:
+  1. Download an ONSPD or NSPL CSV (or a local-authority extract of one)
+  2. python scripts/postcode_index.py build ONSPD_FEB_2026_UK.csv
+  3. python scripts/postcode_index.py lookup "L37 2EE"
+     python scripts/postcode_index.py nearest 53.5545 -3.0716
+
+Set POSTCODE_INDEX to use an index somewhere other than postcodes.idx.
+"""
+
+import os
+import sys
+import csv
+import math
+import mmap
+import struct
+
+INDEX_FILE = os.getenv('POSTCODE_INDEX', 'postcodes.idx')
+
+MAGIC = b'PCIDX\x00\x01\x00'
+HEADER = struct.Struct('<8sII')
+RECORD = struct.Struct('<8sdd')
+ORDINAL = struct.Struct('<I')
+
+NEAREST_MAX_METRES = 250   # Beyond this a point is not "in" any postcode we know
+EARTH_RADIUS_M = 6371000
+
+
+def normalise_postcode(postcode):
+    """'l37 2ee' / 'L372EE' / 'L37  2EE' -> 'L372EE'."""
+    return ''.join((postcode or '').split()).upper()
+
+
+def format_postcode(compact):
+    """'L372EE' -> 'L37 2EE' (inward code is always the last three characters)."""
+    if len(compact) < 5:
+        return compact
+    return f"{compact[:-3]} {compact[-3:]}"
+
+
+def _read_onspd_rows(csv_path):
+    """Yield (compact_postcode, lat, lng) for live postcodes with a grid reference."""
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fields = {name.lower(): name for name in reader.fieldnames or []}
+        pc_col = fields.get('pcds') or fields.get('pcd') or fields.get('postcode')
+        lat_col = fields.get('lat') or fields.get('latitude')
+        lng_col = fields.get('long') or fields.get('lng') or fields.get('longitude')
+        term_col = fields.get('doterm')
+        if not (pc_col and lat_col and lng_col):
+            raise ValueError(f"{csv_path}: expected pcds/lat/long columns, got {reader.fieldnames}")
+
+        for row in reader:
+            if term_col and row.get(term_col):
+                continue   # Terminated postcode
+            try:
+                lat = float(row[lat_col])
+                lng = float(row[lng_col])
+            except (TypeError, ValueError):
+                continue
+            if lat > 90:
+                continue   # ONSPD uses 99.999999 for "no grid reference"
+            compact = normalise_postcode(row[pc_col])
+            if 5 <= len(compact) <= 8:
+                yield compact, lat, lng
+
+
+def build_index(csv_path, out_path=INDEX_FILE):
+    """Build the binary index from an ONSPD/NSPL-style CSV. Returns the record count."""
+    rows = {}
+    for compact, lat, lng in _read_onspd_rows(csv_path):
+        rows[compact] = (lat, lng)
+
+    postcodes = sorted(rows)
+    by_lat = sorted(range(len(postcodes)), key=lambda i: rows[postcodes[i]][0])
+
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(postcodes), 0))
+        for pc in postcodes:
+            lat, lng = rows[pc]
+            f.write(RECORD.pack(pc.encode('ascii'), lat, lng))
+        for i in by_lat:
+            f.write(ORDINAL.pack(i))
+    os.replace(tmp_path, out_path)
+    return len(postcodes)
+
+
+class PostcodeIndex:
+    """Read-only view over a built index file. Lookups are O(log n) against the mmap."""
+
+    def __init__(self, path=INDEX_FILE):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a postcode index")
+        self._records_at = HEADER.size
+        self._by_lat_at = HEADER.size + self.count * RECORD.size
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, i):
+        raw, lat, lng = RECORD.unpack_from(self._mm, self._records_at + i * RECORD.size)
+        return raw.rstrip(b'\x00').decode('ascii'), lat, lng
+
+    def _lat_ordinal(self, j):
+        return ORDINAL.unpack_from(self._mm, self._by_lat_at + j * ORDINAL.size)[0]
+
+    def centroid(self, postcode):
+        """Postcode -> (lat, lng) of its centroid, or None if unknown."""
+        target = normalise_postcode(postcode)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pc, lat, lng = self._record(mid)
+            if pc < target:
+                lo = mid + 1
+            elif pc > target:
+                hi = mid
+            else:
+                return lat, lng
+        return None
+
+    def _first_lat_at_least(self, lat):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(self._lat_ordinal(mid))[1] < lat:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def nearest(self, lat, lng, max_metres=NEAREST_MAX_METRES):
+        """
+        Point -> formatted postcode whose centroid is closest, or '' if none
+        lies within max_metres. Only scans the latitude band that could match.
+        """
+        if lat in (None, '') or lng in (None, ''):
+            return ''
+        lat, lng = float(lat), float(lng)
+        band = math.degrees(max_metres / EARTH_RADIUS_M)
+        cos_lat = math.cos(math.radians(lat))
+
+        best_pc, best_d2 = '', (max_metres / EARTH_RADIUS_M) ** 2
+        j = self._first_lat_at_least(lat - band)
+        while j < self.count:
+            pc, plat, plng = self._record(self._lat_ordinal(j))
+            if plat > lat + band:
+                break
+            dx = math.radians(plng - lng) * cos_lat
+            dy = math.radians(plat - lat)
+            d2 = dx * dx + dy * dy
+            if d2 <= best_d2:
+                best_pc, best_d2 = pc, d2
+            j += 1
+        return format_postcode(best_pc) if best_pc else ''
+
+
+def load_index(path=INDEX_FILE):
+    """Open the index if it has been built, else None (callers fall back to old behaviour)."""
+    if not os.path.exists(path):
+        return None
+    return PostcodeIndex(path)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('build', 'lookup', 'nearest'):
+        print(__doc__)
+        exit(1)
+
+    command = sys.argv[1]
+    if command == 'build':
+        count = build_index(sys.argv[2])
+        print(f"Indexed {count} postcodes -> {INDEX_FILE}")
+        return
+
+    index = load_index()
+    if index is None:
+        print(f"Error: {INDEX_FILE} not found — run 'build' first")
+        exit(1)
+
+    if command == 'lookup':
+        print(index.centroid(sys.argv[2]) or 'Not found')
+    else:
+        print(index.nearest(sys.argv[2], sys.argv[3]) or 'Not found')
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
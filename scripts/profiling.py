@@ -0,0 +1,139 @@
+"""
+Opt-in profiling for the pipeline scripts.
+
+Any script that calls install() accepts --profile. With it, the run is
+recorded by cProfile and by a stack sampler on the main thread, and on exit
+these are written to profiles/<script>-<timestamp>.*:
+
+  .collapsed   one "frame;frame;frame count" line per stack — feed it to
+               flamegraph.pl or speedscope
+  .txt         top PROFILE_TOP functions by cumulative and by own time,
+               plus the timing spans below
+  .prof        raw cProfile stats for snakeviz / pstats
+
+Timing spans are cheap and always on; they are only reported with --profile.
+Wrap a function with @timed('name') or a block with `with span('name'):`.
+"""
+
+import os
+import sys
+import time
+import atexit
+import pstats
+import cProfile
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+PROFILE_DIR = 'profiles'
+PROFILE_TOP = 30
+SAMPLE_INTERVAL = 0.005   # Seconds between stack samples
+
+_spans = defaultdict(lambda: [0, 0.0, 0.0])   # name -> [calls, total, max]
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        s = _spans[name]
+        s[0] += 1
+        s[1] += elapsed
+        s[2] = max(s[2], elapsed)
+
+
+def timed(name):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def atimed(name):
+    """timed() for coroutines — measures wall time including awaits."""
+    def decorate(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack every SAMPLE_INTERVAL seconds."""
+
+    def __init__(self, thread_id):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _span_report():
+    lines = [f"{'span':<28}{'calls':>8}{'total s':>12}{'mean ms':>12}{'max ms':>12}"]
+    for name, (calls, total, worst) in sorted(_spans.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"{name:<28}{calls:>8}{total:>12.2f}{total / calls * 1000:>12.1f}{worst * 1000:>12.1f}")
+    return '\n'.join(lines)
+
+
+def install():
+    """Strip --profile from argv and, if it was there, profile the rest of the run."""
+    if '--profile' not in sys.argv:
+        return
+    sys.argv.remove('--profile')
+
+    script = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    stem = os.path.join(PROFILE_DIR, f"{script}-{time.strftime('%Y%m%d-%H%M%S')}")
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident())
+    started = time.perf_counter()
+
+    def finish():
+        profiler.disable()
+        sampler.stop()
+        wall = time.perf_counter() - started
+
+        with open(f"{stem}.collapsed", 'w') as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        profiler.dump_stats(f"{stem}.prof")
+        with open(f"{stem}.txt", 'w') as f:
+            f.write(f"{script}: {wall:.1f}s wall, {sum(sampler.stacks.values())} samples\n\n")
+            f.write(_span_report() + '\n\n')
+            stats = pstats.Stats(profiler, stream=f).strip_dirs()
+            stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+            stats.sort_stats('tottime').print_stats(PROFILE_TOP)
+
+        print(f"\nProfile ({wall:.1f}s wall):")
+        print(_span_report())
+        print(f"  Written to {stem}.txt / .collapsed / .prof")
+
+    atexit.register(finish)
+    sampler.start()
+    profiler.enable()
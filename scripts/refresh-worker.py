@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Long-running refresh worker: keeps enriched data fresh one business at a time.
+
+Every business has a "RefreshTask" row per kind of data:
+
+  details  Google Place Details -> phone, hours, rating, ... (businesses with a placeId)
+  fsa      FSA rating by fhrsId                          (food businesses with an fhrsId)
+  photos   Google photo CDN URL                          (images empty or still on Google's CDN)
+
+The worker repeatedly claims the most overdue task, runs it and schedules
+the next run from how that business's data behaves: the interval halves
+when the refresh changed something and grows by half when it did not,
+within each kind's min/max. Failures retry with exponential backoff.
+
+API calls are paced evenly over the day: each API gets DAILY_BUDGET calls
+spaced 24h / budget apart, so a backlog drains steadily instead of in a
+burst. Budgets, pacing and the call counts are per process, so only one
+worker may run: it holds a Postgres advisory lock (WORKER_LOCK) for its
+lifetime and a second worker exits at startup. Tasks are still claimed with
+a short lease, so a task whose worker died is picked up again.
+
+Queue depth, lag and calls made today are written to refresh-status.json
+every STATUS_EVERY seconds.
+
+There is no --record/--replay: which task is claimed next depends on the
+live queue, which each run reschedules, so a replay could not repeat it.
+
+Usage:
+  python scripts/refresh-worker.py [--once] [--profile]
+
+  --once   exit when nothing is due instead of waiting for more work
+"""
+
+import os
+import json
+import time
+import random
+import signal
+import asyncio
+import argparse
+import threading
+from datetime import datetime, timezone
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+from urllib.parse import urlparse
+
+import profiling
+from change_events import delete_business
+from fsa_client import FsaClient, rating_value, save_rating
+from places import get_photo_url, get_place_details, update_business, update_photo
+
+profiling.install()
+
+load_dotenv(".env.local")
+load_dotenv()
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not set")
+    exit(1)
+
+if not os.getenv('GOOGLE_PLACES_API_KEY'):
+    print("Error: GOOGLE_PLACES_API_KEY not set")
+    exit(1)
+
+STATUS_FILE = 'refresh-status.json'
+SOURCE = 'refresh-worker'
+
+# Calls per UTC day for each API
+DAILY_BUDGET = {
+    'google': int(os.getenv('REFRESH_GOOGLE_BUDGET', '1500')),
+    'fsa':    int(os.getenv('REFRESH_FSA_BUDGET', '2000')),
+}
+
+# Hours between refreshes: starting interval and the range it adapts within
+KINDS = {
+    'details': {'api': 'google', 'calls': 1, 'initial': 7 * 24,  'min': 24,     'max': 60 * 24},
+    'fsa':     {'api': 'fsa',    'calls': 1, 'initial': 30 * 24, 'min': 7 * 24, 'max': 180 * 24},
+    'photos':  {'api': 'google', 'calls': 2, 'initial': 14 * 24, 'min': 3 * 24, 'max': 60 * 24},
+}
+CHANGED_FACTOR = 0.5     # Interval multiplier when a refresh changed something
+UNCHANGED_FACTOR = 1.5   # ... and when it did not
+JITTER = 0.1             # +/- fraction added to each interval so tasks don't clump
+RETRY_BASE_HOURS = 1     # First retry after a failure; doubles per consecutive failure
+
+FOOD_CAT_SLUGS = ['restaurants', 'cafes', 'pubs']
+
+LEASE_MINUTES = 15       # A claimed task is re-offered after this if its worker dies
+POLL_SECONDS = 60        # Longest sleep while idle
+SYNC_EVERY = 3600        # Seconds between scans for new businesses
+STATUS_EVERY = 30        # Seconds between status file writes
+WORKER_LOCK = 0x52465752 # pg advisory lock key held by the running worker
+
+stop = threading.Event()
+
+
+def connect_db():
+    parsed = urlparse(DATABASE_URL)
+    return psycopg2.connect(
+        host=parsed.hostname,
+        port=parsed.port or 5432,
+        database=parsed.path.lstrip('/'),
+        user=parsed.username,
+        password=parsed.password,
+        sslmode='require',
+    )
+
+
+def sync_tasks(conn):
+    """
+    Queue tasks for businesses that need them and drop photo tasks that no longer apply.
+    New tasks are spread over their first interval rather than all due at once.
+    """
+    google_cdn = '(cardinality(b.images) = 0 OR b.images[1] LIKE %(cdn)s)'
+    params = {'food': FOOD_CAT_SLUGS, 'cdn': '%googleusercontent.com%'}
+    eligible = {
+        'details': 'SELECT b.id FROM "Business" b WHERE b."placeId" IS NOT NULL',
+        'fsa': """
+            SELECT b.id FROM "Business" b JOIN "Category" c ON c.id = b."categoryId"
+            WHERE b."fhrsId" IS NOT NULL AND c.slug = ANY(%(food)s)
+        """,
+        'photos': f'SELECT b.id FROM "Business" b WHERE b."placeId" IS NOT NULL AND {google_cdn}',
+    }
+    added = {}
+    with conn.cursor() as cur:
+        for kind, select in eligible.items():
+            initial = KINDS[kind]['initial']
+            cur.execute(f"""
+                INSERT INTO "RefreshTask" ("businessId", "kind", "dueAt", "intervalHours")
+                SELECT e.id, %(kind)s, NOW() + random() * %(initial)s * INTERVAL '1 hour', %(initial)s
+                FROM ({select}) e
+                ON CONFLICT DO NOTHING
+            """, {**params, 'kind': kind, 'initial': initial})
+            added[kind] = cur.rowcount
+        cur.execute(f"""
+            DELETE FROM "RefreshTask" t USING "Business" b
+            WHERE t."businessId" = b.id AND t.kind = 'photos' AND NOT {google_cdn}
+        """, params)
+    conn.commit()
+    return added
+
+
+def claim(conn, kinds):
+    """Lease the most overdue task of the given kinds, or None."""
+    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        cur.execute("""
+            UPDATE "RefreshTask" t SET "dueAt" = NOW() + %s * INTERVAL '1 minute'
+            FROM (
+                SELECT "businessId", kind FROM "RefreshTask"
+                WHERE kind = ANY(%s) AND "dueAt" <= NOW()
+                ORDER BY "dueAt"
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ) due, "Business" b
+            WHERE t."businessId" = due."businessId" AND t.kind = due.kind AND b.id = t."businessId"
+            RETURNING t."businessId", t.kind, t."intervalHours", t.failures,
+                      b.name, b."placeId", b."fhrsId", b.images
+        """, (LEASE_MINUTES, list(kinds)))
+        task = cur.fetchone()
+    conn.commit()
+    return task
+
+
+def reschedule(conn, task, changed, failed):
+    spec = KINDS[task['kind']]
+    if failed:
+        failures = task['failures'] + 1
+        interval = task['intervalHours']
+        wait = min(interval, RETRY_BASE_HOURS * 2 ** (failures - 1))
+    else:
+        failures = 0
+        factor = CHANGED_FACTOR if changed else UNCHANGED_FACTOR
+        interval = min(spec['max'], max(spec['min'], task['intervalHours'] * factor))
+        wait = interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE "RefreshTask" SET
+                "dueAt"         = NOW() + %s * INTERVAL '1 hour',
+                "intervalHours" = %s,
+                "failures"      = %s,
+                "lastRunAt"     = NOW(),
+                "lastChangedAt" = CASE WHEN %s THEN NOW() ELSE "lastChangedAt" END
+            WHERE "businessId" = %s AND kind = %s
+        """, (wait, interval, failures, changed, task['businessId'], task['kind']))
+    conn.commit()
+
+
+async def fetch_establishment(fhrs_id):
+    async with FsaClient() as fsa:
+        return await fsa.establishment(fhrs_id), fsa.requests
+
+
+def run_task(conn, task):
+    """
+    Run one task. Returns (outcome, API calls made), where outcome is
+    'changed', 'unchanged', 'failed' or 'removed' (task no longer applies).
+    """
+    kind, biz_id = task['kind'], task['businessId']
+
+    if kind == 'details':
+        details = get_place_details(task['placeId'])
+        if not details:
+            return 'failed', 1
+        if details.get('business_status') == 'CLOSED_PERMANENTLY':
+            with conn.cursor() as cur:
+                delete_business(cur, biz_id, SOURCE)
+            conn.commit()
+            return 'removed', 1
+        changed = update_business(conn, biz_id, details, task['placeId'], source=SOURCE)
+        return ('changed' if changed else 'unchanged'), 1
+
+    if kind == 'fsa':
+        establishment, calls = asyncio.run(fetch_establishment(task['fhrsId']))
+        if not establishment:
+            return 'failed', calls
+        changed = save_rating(conn, biz_id, rating_value(establishment),
+                              establishment.get('RatingDate') or None,
+                              str(establishment.get('FHRSID') or task['fhrsId']), source=SOURCE)
+        return ('changed' if changed else 'unchanged'), calls
+
+    if kind == 'photos':
+        images = task['images'] or []
+        if images and 'googleusercontent.com' not in images[0]:
+            # Localised by download-business-images.mjs since the last sync
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM "RefreshTask" WHERE "businessId" = %s AND kind = %s', (biz_id, kind))
+            conn.commit()
+            return 'removed', 0
+        url = get_photo_url(task['placeId'])
+        # No photo (or no answer) leaves the current image alone; not worth a fast retry
+        if not url:
+            return 'unchanged', 2
+        return ('changed' if update_photo(conn, biz_id, url, SOURCE) else 'unchanged'), 2
+
+    raise ValueError(f"unknown task kind {kind!r}")
+
+
+def queue_status(conn):
+    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        cur.execute("""
+            SELECT kind,
+                   COUNT(*) AS tasks,
+                   COUNT(*) FILTER (WHERE "dueAt" <= NOW()) AS due,
+                   COALESCE(EXTRACT(EPOCH FROM MAX(NOW() - "dueAt") FILTER (WHERE "dueAt" <= NOW())), 0) AS lag,
+                   MIN("dueAt") AS "nextDueAt",
+                   AVG("intervalHours") AS "avgInterval"
+            FROM "RefreshTask"
+            GROUP BY kind
+        """)
+        rows = cur.fetchall()
+    return {
+        r['kind']: {
+            'tasks': r['tasks'],
+            'due': r['due'],
+            'maxLagSeconds': round(float(r['lag'])),
+            'nextDueAt': r['nextDueAt'].isoformat() if r['nextDueAt'] else None,
+            'avgIntervalHours': round(float(r['avgInterval']), 1),
+        }
+        for r in rows
+    }
+
+
+def load_calls_today(today):
+    """Calls already made today, from the last status file — budgets survive a restart."""
+    if os.path.exists(STATUS_FILE):
+        with open(STATUS_FILE) as f:
+            status = json.load(f)
+        if status.get('day') == today:
+            return {api: s.get('callsToday', 0) for api, s in status.get('apis', {}).items()}
+    return {}
+
+
+def write_status(status):
+    tmp = STATUS_FILE + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp, STATUS_FILE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously refresh business data from a per-business queue")
+    parser.add_argument('--once', action='store_true', help="exit when nothing is due")
+    args = parser.parse_args()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    print("Formby Guide — Refresh worker")
+    print("=" * 60)
+
+    conn = connect_db()
+    with conn.cursor() as cur:
+        # Session-level: held until the connection closes, across commits
+        cur.execute('SELECT pg_try_advisory_lock(%s)', (WORKER_LOCK,))
+        locked = cur.fetchone()[0]
+    conn.commit()
+    if not locked:
+        print("Another refresh worker is already running — exiting")
+        conn.close()
+        exit(1)
+    print("Connected to database")
+
+    apis = sorted(DAILY_BUDGET)
+    kinds_by_api = {api: [k for k, spec in KINDS.items() if spec['api'] == api] for api in apis}
+    spacing = {api: 86400 / DAILY_BUDGET[api] for api in apis}
+    for api in apis:
+        print(f"  {api:<8} budget {DAILY_BUDGET[api]}/day — one call every {spacing[api]:.0f}s")
+
+    today = datetime.now(timezone.utc).date().isoformat()
+    calls = {api: 0 for api in apis}
+    calls.update(load_calls_today(today))
+    next_slot = {api: 0.0 for api in apis}
+    outcomes = {kind: {'changed': 0, 'unchanged': 0, 'failed': 0, 'removed': 0} for kind in KINDS}
+    next_sync = next_status = 0.0
+    last_task = None
+
+    while not stop.is_set():
+        now = time.time()
+        day = datetime.now(timezone.utc).date().isoformat()
+        if day != today:
+            today, calls = day, {api: 0 for api in apis}
+
+        try:
+            if now >= next_sync:
+                added = sync_tasks(conn)
+                if any(added.values()):
+                    print(f"Queued new tasks: {', '.join(f'{k}={n}' for k, n in added.items() if n)}")
+                next_sync = now + SYNC_EVERY
+
+            ran = False
+            for api in sorted(apis, key=next_slot.get):
+                if next_slot[api] > now or calls[api] >= DAILY_BUDGET[api]:
+                    continue
+                task = claim(conn, kinds_by_api[api])
+                if not task:
+                    continue
+
+                safe = task['name'].encode('ascii', 'replace').decode('ascii')
+                try:
+                    outcome, used = run_task(conn, task)
+                except Exception as e:
+                    print(f"  Task error: {e}")
+                    conn.rollback()
+                    outcome, used = 'failed', KINDS[task['kind']]['calls']
+                if outcome != 'removed':
+                    reschedule(conn, task, outcome == 'changed', outcome == 'failed')
+
+                calls[api] += used
+                next_slot[api] = max(next_slot[api], now) + used * spacing[api]
+                outcomes[task['kind']][outcome] += 1
+                last_task = {'kind': task['kind'], 'business': task['name'], 'outcome': outcome,
+                             'at': datetime.now(timezone.utc).isoformat()}
+                print(f"  [{task['kind']:<7}] {safe} — {outcome}")
+                ran = True
+                break
+
+            if now >= next_status or (args.once and not ran):
+                write_status({
+                    'updatedAt': datetime.now(timezone.utc).isoformat(),
+                    'day': today,
+                    'queue': queue_status(conn),
+                    'apis': {
+                        api: {
+                            'budget': DAILY_BUDGET[api],
+                            'callsToday': calls[api],
+                            'spacingSeconds': round(spacing[api], 1),
+                        }
+                        for api in apis
+                    },
+                    'outcomes': outcomes,
+                    'lastTask': last_task,
+                })
+                next_status = now + STATUS_EVERY
+        except psycopg2.OperationalError as e:
+            print(f"Database error: {e} — reconnecting in {POLL_SECONDS}s")
+            stop.wait(POLL_SECONDS)
+            conn = connect_db()
+            continue
+
+        if ran:
+            continue
+        if args.once and all(calls[api] >= DAILY_BUDGET[api] or next_slot[api] <= now for api in apis):
+            break
+        waits = [next_slot[api] - now for api in apis if next_slot[api] > now]
+        stop.wait(min(waits + [POLL_SECONDS]))
+
+    conn.close()
+
+    print(f"\n{'=' * 60}")
+    print("STOPPED")
+    for kind, counts in outcomes.items():
+        print(f"  {kind:<8} " + '  '.join(f"{k}: {v}" for k, v in counts.items()))
+    print(f"  Calls today: {', '.join(f'{api}={calls[api]}' for api in apis)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Roll raw PageView and BusinessClick rows up into daily summary tables.
+
+Each source keeps a high-water mark in "RollupState". A run recomputes
+every day from (high-water - LATE_WINDOW) onwards and overwrites those
+days' summary rows, so it is idempotent and picks up rows that arrive up
+to LATE_WINDOW late. Earlier days are never rescanned.
+
+  PageView      -> "DailyPageViewRollup" (day, path)
+                   "DailyReferrerRollup" (day, referrer)
+  BusinessClick -> "DailyClickRollup"    (day, businessId, type)
+
+With --prune-days N, raw rows older than N days are deleted once they are
+safely rolled up (never inside the late window).
+
+Usage:
+  python scripts/rollup-stats.py [--prune-days 90] [--profile]
+"""
+
+import os
+import argparse
+from datetime import datetime, timedelta
+import psycopg2
+from dotenv import load_dotenv
+from urllib.parse import urlparse
+
+import profiling
+
+profiling.install()
+load_dotenv(".env.local")
+load_dotenv()
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not set")
+    exit(1)
+
+LATE_WINDOW = timedelta(hours=6)
+EPOCH = datetime(1970, 1, 1)
+
+# source name -> (raw table, [(rollup table, group-by columns, extra WHERE)])
+ROLLUPS = {
+    'pageviews': ('PageView', [
+        ('DailyPageViewRollup', ['path'], ''),
+        ('DailyReferrerRollup', ['referrer'], 'AND "referrer" IS NOT NULL'),
+    ]),
+    'clicks': ('BusinessClick', [
+        ('DailyClickRollup', ['businessId', 'type'], ''),
+    ]),
+}
+
+
+def connect_db():
+    parsed = urlparse(DATABASE_URL)
+    return psycopg2.connect(
+        host=parsed.hostname,
+        port=parsed.port or 5432,
+        database=parsed.path.lstrip('/'),
+        user=parsed.username,
+        password=parsed.password,
+        sslmode='require',
+    )
+
+
+def get_high_water(cur, name):
+    cur.execute('SELECT "highWater" FROM "RollupState" WHERE name = %s FOR UPDATE', (name,))
+    row = cur.fetchone()
+    return row[0] if row else EPOCH
+
+
+def set_high_water(cur, name, high_water):
+    cur.execute("""
+        INSERT INTO "RollupState" (name, "highWater", "runAt") VALUES (%s, %s, NOW())
+        ON CONFLICT (name) DO UPDATE SET "highWater" = EXCLUDED."highWater", "runAt" = NOW()
+    """, (name, high_water))
+
+
+def rollup_source(conn, name, now):
+    """Recompute all days touched since the last run. Returns {rollup table: rows written}."""
+    source, targets = ROLLUPS[name]
+    written = {}
+    with conn.cursor() as cur:
+        high_water = get_high_water(cur, name)
+        from_day = (max(high_water, EPOCH + LATE_WINDOW) - LATE_WINDOW).date()
+
+        for target, columns, where in targets:
+            cols = ', '.join(f'"{c}"' for c in columns)
+            cur.execute(f'DELETE FROM "{target}" WHERE day >= %s', (from_day,))
+            cur.execute(f"""
+                INSERT INTO "{target}" (day, {cols}, count)
+                SELECT "createdAt"::date, {cols}, COUNT(*)
+                FROM "{source}"
+                WHERE "createdAt" >= %s AND "createdAt" < %s {where}
+                GROUP BY 1, {cols}
+            """, (from_day, now))
+            written[target] = cur.rowcount
+
+        set_high_water(cur, name, now)
+    conn.commit()
+    return written, from_day
+
+
+def prune_source(conn, name, before):
+    source, _ = ROLLUPS[name]
+    with conn.cursor() as cur:
+        cur.execute(f'DELETE FROM "{source}" WHERE "createdAt" < %s', (before,))
+        deleted = cur.rowcount
+    conn.commit()
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll up page views and clicks into daily summaries")
+    parser.add_argument('--prune-days', type=int, help="delete raw rows older than this many days")
+    args = parser.parse_args()
+
+    print("Formby Guide — Stats rollup")
+    print("=" * 60)
+
+    conn = connect_db()
+    with conn.cursor() as cur:
+        # createdAt columns are UTC timestamps without time zone
+        cur.execute("SELECT NOW() AT TIME ZONE 'UTC'")
+        now = cur.fetchone()[0]
+
+    for name in ROLLUPS:
+        written, from_day = rollup_source(conn, name, now)
+        for target, rows in written.items():
+            print(f"  {target:<22} {rows:>6} rows from {from_day}")
+
+        if args.prune_days:
+            cutoff = datetime.combine(min((now - timedelta(days=args.prune_days)).date(), from_day),
+                                      datetime.min.time())
+            deleted = prune_source(conn, name, cutoff)
+            print(f"  {ROLLUPS[name][0]:<22} {deleted:>6} raw rows pruned before {cutoff.date()}")
+
+    conn.close()
+    print(f"\nRolled up to {now:%Y-%m-%d %H:%M} UTC")
+
+
+if __name__ == '__main__':
+    main()
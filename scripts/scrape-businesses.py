@@ -13,34 +13,46 @@ overlapping into Southport to the north or Liverpool to the south.
 Usage:
   1. Set GOOGLE_PLACES_API_KEY in .env.local
   2. pip install -r scripts/requirements.txt
-  3. python scripts/scrape-businesses.py
+  3. python scripts/scrape-businesses.py [--regions formby,southport] [--full] [--profile]
+                                         [--record FILE | --replay FILE]
   4. npm run import-businesses
+
+--regions scrapes several towns (service_area.REGIONS) in one run. Their search
+points are merged so each area is queried once, places are deduplicated by
+place_id across regions, and each row's `regions` column lists every region
+whose circles contain it. Defaults to service_area.DEFAULT_REGIONS.
+
+Routine runs skip (point, type) queries that have stopped turning up new
+businesses, sampling them every SAMPLE_LOW_YIELD_EVERY runs. A full sweep of
+every combination runs every FULL_SWEEP_EVERY runs, or on --full. Per-query
+yield stats are kept in scrape-yield.json; delete it to start over.
+
+Postcodes are filled from the offline index if postcodes.idx has been built
+(see scripts/postcode_index.py); otherwise they are left for the enricher.
 """
 
 import os
 import csv
-import time
-import requests
+import json
+import argparse
 from dotenv import load_dotenv
 
+import http_archive
+import profiling
+from postcode_index import load_index
+from service_area import DEFAULT_REGIONS, REGIONS, parse_regions, plan_points, point_regions, regions_for
+
+profiling.install()
+http_archive.install()
 load_dotenv(".env.local")
 load_dotenv()
 
 API_KEY = os.getenv('GOOGLE_PLACES_API_KEY')
-if not API_KEY:
+if not API_KEY and not http_archive.replaying():
     print("Error: GOOGLE_PLACES_API_KEY not found in .env.local or .env")
     print("Get a key at: https://console.cloud.google.com/apis/credentials")
     exit(1)
 
-# Search points: (label, lat, lng, radius_metres)
-# Covers Formby village → Hightown → Crosby Beach without overlapping
-# Southport (11.2km north) or Liverpool suburbs (>9km south)
-SEARCH_POINTS = [
-    ("Formby village & inland", 53.5545, -3.0716, 4000),
-    ("Hightown village & beach", 53.5195, -3.0680, 2000),
-    ("Crosby Beach / Another Place", 53.4847, -3.0620, 2000),
-]
-
 # Google Places type -> Formby Guide category slug
 CATEGORY_MAP = {
     # Restaurants
@@ -103,6 +115,14 @@ CATEGORY_MAP = {
     'spa':                  'shopping',
 }
 
+HTTP = http_archive.session()
+
+YIELD_FILE = 'scrape-yield.json'
+FULL_SWEEP_EVERY = 6          # Every Nth run queries every (point, type)
+SAMPLE_LOW_YIELD_EVERY = 3    # Low-yield queries are re-checked every N runs
+LOW_YIELD_THRESHOLD = 0.5     # Average new place_ids per run below which a query is low-yield
+YIELD_SMOOTHING = 0.3         # Weight of the latest run in the moving average
+
 # Types to search at every point
 SEARCH_TYPES = [
     'restaurant',
@@ -133,8 +153,9 @@ SEARCH_TYPES = [
 ]
 
 
+@profiling.timed('search_places')
 def search_places(lat, lng, place_type, radius):
-    """Fetch all pages of results for a given type near a point."""
+    """Fetch all pages of results for a given type near a point. Returns (results, pages)."""
     url = 'https://maps.googleapis.com/maps/api/place/nearbysearch/json'
     params = {
         'location': f'{lat},{lng}',
@@ -146,7 +167,7 @@ def search_places(lat, lng, place_type, radius):
     results = []
     page = 1
     while True:
-        response = requests.get(url, params=params, timeout=10)
+        response = HTTP.get(url, params=params, timeout=10)
         data = response.json()
         status = data.get('status')
 
@@ -164,32 +185,111 @@ def search_places(lat, lng, place_type, radius):
             break
 
         page += 1
-        time.sleep(2)
+        http_archive.pause(2)
         params = {'pagetoken': next_page_token, 'key': API_KEY}
 
-    return results
+    return results, page
+
+
+def load_yield_stats():
+    if os.path.exists(YIELD_FILE):
+        with open(YIELD_FILE) as f:
+            return json.load(f)
+    return {'runs': 0, 'queries': {}}
+
+
+def save_yield_stats(stats):
+    if http_archive.replaying():
+        return
+    with open(YIELD_FILE, 'w') as f:
+        json.dump(stats, f, indent=2)
+
+
+def query_key(label, place_type):
+    return f"{label}|{place_type}"
+
+
+def schedule_types(label, stats, run_no, full_sweep):
+    """
+    Types to query at this point this run, in SEARCH_TYPES order.
+    Never-seen queries always run; low-yield ones only when due a sample.
+    The order must stay fixed: a place's category comes from the first type
+    that returns it.
+    """
+    scheduled = []
+    for place_type in SEARCH_TYPES:
+        q = stats['queries'].get(query_key(label, place_type))
+        if q is None:
+            scheduled.append(place_type)
+            continue
+        due_sample = run_no - q['last_run'] >= SAMPLE_LOW_YIELD_EVERY
+        if full_sweep or q['avg_new'] >= LOW_YIELD_THRESHOLD or due_sample:
+            scheduled.append(place_type)
+    return scheduled
+
+
+def record_yield(stats, label, place_type, run_no, new_count, result_count, pages):
+    key = query_key(label, place_type)
+    q = stats['queries'].get(key)
+    avg_new = new_count if q is None else (
+        YIELD_SMOOTHING * new_count + (1 - YIELD_SMOOTHING) * q['avg_new']
+    )
+    stats['queries'][key] = {
+        'last_run':  run_no,
+        'new':       new_count,
+        'results':   result_count,
+        'dup_ratio': round(1 - new_count / result_count, 3) if result_count else 1.0,
+        'pages':     pages,
+        'avg_new':   round(avg_new, 3),
+    }
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape Formby businesses from Google Places")
+    parser.add_argument('--full', action='store_true', help="query every (point, type), ignoring yield stats")
+    parser.add_argument('--regions', type=parse_regions, default=DEFAULT_REGIONS,
+                        help=f"comma-separated regions to scrape ({', '.join(REGIONS)})")
+    args = parser.parse_args()
+
+    search_points = plan_points(args.regions)
+    requested_points = sum(len(REGIONS[r]['points']) for r in args.regions)
+
+    stats = http_archive.state('scrape-yield', load_yield_stats)
+    run_no = stats['runs'] + 1
+    full_sweep = args.full or not stats['queries'] or run_no % FULL_SWEEP_EVERY == 0
+
     print("Formby Guide Business Scraper")
     print("=" * 60)
-    for label, lat, lng, radius in SEARCH_POINTS:
+    print(f"  Regions: {', '.join(REGIONS[r]['name'] for r in args.regions)}")
+    for label, lat, lng, radius in search_points:
         print(f"  {label}: {lat}, {lng} @ {radius}m")
+    if requested_points > len(search_points):
+        print(f"  ({requested_points - len(search_points)} duplicate/contained points dropped)")
     print(f"  Types: {len(SEARCH_TYPES)}")
+    print(f"  Run {run_no}: {'full sweep' if full_sweep else 'yield-scheduled'}")
     print("=" * 60)
 
+    postcodes = load_index()
+    if postcodes:
+        print(f"  Postcode index: {len(postcodes)} postcodes")
+
     all_businesses = {}  # Deduplicate by place_id
     total_api_calls = 0
+    skipped_queries = 0
 
-    for point_idx, (label, lat, lng, radius) in enumerate(SEARCH_POINTS, 1):
-        print(f"\n-- Point {point_idx}/{len(SEARCH_POINTS)}: {label} --")
+    for point_idx, point in enumerate(search_points, 1):
+        label, lat, lng, radius = point
+        types = schedule_types(label, stats, run_no, full_sweep)
+        skipped_queries += len(SEARCH_TYPES) - len(types)
+        print(f"\n-- Point {point_idx}/{len(search_points)}: {label} "
+              f"({len(types)}/{len(SEARCH_TYPES)} types) --")
 
         point_new = 0
-        for idx, place_type in enumerate(SEARCH_TYPES, 1):
-            print(f"  [{idx}/{len(SEARCH_TYPES)}] {place_type}...", end=" ", flush=True)
+        for idx, place_type in enumerate(types, 1):
+            print(f"  [{idx}/{len(types)}] {place_type}...", end=" ", flush=True)
 
-            places = search_places(lat, lng, place_type, radius)
-            total_api_calls += max(1, len(places) // 20)
+            places, pages = search_places(lat, lng, place_type, radius)
+            total_api_calls += pages
 
             new_count = 0
             for place in places:
@@ -198,30 +298,41 @@ def main():
                     continue
 
                 category_slug = CATEGORY_MAP.get(place_type, 'activities')
+                location = place.get('geometry', {}).get('location', {})
+                place_lat = location.get('lat', '')
+                place_lng = location.get('lng', '')
                 all_businesses[place_id] = {
+                    'place_id':    place_id,
                     'name':        place.get('name', ''),
                     'category':    category_slug,
                     'address':     place.get('vicinity', ''),
-                    'postcode':    '',
-                    'lat':         place.get('geometry', {}).get('location', {}).get('lat', ''),
-                    'lng':         place.get('geometry', {}).get('location', {}).get('lng', ''),
+                    'postcode':    postcodes.nearest(place_lat, place_lng) if postcodes else '',
+                    'lat':         place_lat,
+                    'lng':         place_lng,
                     'phone':       '',
                     'website':     '',
                     'price_range': str(place.get('price_level', '')),
+                    # Every known region, not just this run's, so a later single-region run agrees;
+                    # results just outside every circle go to the region that was searched
+                    'regions':     ';'.join(regions_for(place_lat, place_lng) or point_regions(point)),
                 }
                 new_count += 1
 
             print(f"+{new_count} | running total: {len(all_businesses)}")
+            record_yield(stats, label, place_type, run_no, new_count, len(places), pages)
             point_new += new_count
-            time.sleep(0.3)
+            http_archive.pause(0.3)
 
         print(f"  >> Point {point_idx} added {point_new} new businesses")
 
+    stats['runs'] = run_no
+    save_yield_stats(stats)
+
     # Write CSV
     output_file = 'businesses.csv'
     with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['name', 'category', 'address', 'postcode', 'lat', 'lng',
-                      'phone', 'website', 'price_range']
+        fieldnames = ['place_id', 'name', 'category', 'address', 'postcode', 'lat', 'lng',
+                      'phone', 'website', 'price_range', 'regions']
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         for biz in all_businesses.values():
@@ -230,7 +341,11 @@ def main():
     print(f"\n{'=' * 60}")
     print(f"COMPLETE")
     print(f"  Unique businesses found: {len(all_businesses)}")
-    print(f"  Approximate API calls:   {total_api_calls}")
+    for region in args.regions:
+        in_region = sum(1 for b in all_businesses.values() if region in b['regions'].split(';'))
+        print(f"    {REGIONS[region]['name']:<21}{in_region}")
+    print(f"  API calls:               {total_api_calls}")
+    print(f"  Low-yield queries skipped: {skipped_queries}")
     print(f"  Estimated cost:          ${total_api_calls * 0.032:.2f}")
     print(f"  Saved to:                {output_file}")
     print(f"\nNext steps:")
@@ -238,6 +353,9 @@ def main():
     print(f"  python scripts/enrich-businesses.py       (fetch full details)")
     print(f"  python scripts/cleanup-businesses.py      (remove non-visitor biz)")
     print(f"  npm run generate-descriptions             (write SEO descriptions)")
+    print(f"  python scripts/drain-change-events.py     (revalidate changed pages)")
+    print(f"  python scripts/export-snapshot.py         (refresh static snapshot)")
+    print(f"  python scripts/refresh-worker.py          (keep details/FSA/photos fresh)")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Full-text and trigram search over businesses, maintained by the pipeline.
+
+"Business"."searchVector" is a weighted tsvector:
+  A  name
+  B  tags
+  C  address + postcode
+  D  shortDescription + description
+It has a GIN index, and name has a pg_trgm GIN index for typo-tolerant
+matching ("formby hal golf" -> "Formby Hall Golf Resort & Spa").
+
+A BEFORE INSERT OR UPDATE trigger recomputes the vector whenever one of
+those columns is written, in the same statement, so every writer keeps it
+current: the importer, generate-descriptions, the enrichers and the admin
+UI alike. ensure_search_schema() is idempotent and is run at the start of
+every enrichment, so the column, indexes and trigger come back if a
+`prisma db push` drops the indexes. DDL on "Business" takes an ACCESS
+EXCLUSIVE lock that queues site reads behind any open transaction, so it
+only creates what the catalog says is missing; rebuild also recreates the
+trigger, e.g. after SOURCE_COLUMNS changes.
+
+Usage:
+  python scripts/search_index.py rebuild     (create schema + backfill every row)
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+from urllib.parse import urlparse
+
+TRIGGER_NAME = 'Business_searchVector_trg'
+
+# (query returning a row if the object exists, DDL creating it)
+SEARCH_SCHEMA_SQL = [
+    ("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'",
+     'CREATE EXTENSION IF NOT EXISTS pg_trgm'),
+    ("""SELECT 1 FROM pg_attribute
+        WHERE attrelid = '"Business"'::regclass AND attname = 'searchVector' AND NOT attisdropped""",
+     'ALTER TABLE "Business" ADD COLUMN IF NOT EXISTS "searchVector" tsvector'),
+    ("""SELECT 1 WHERE to_regclass('"Business_searchVector_idx"') IS NOT NULL""",
+     'CREATE INDEX IF NOT EXISTS "Business_searchVector_idx" ON "Business" USING GIN ("searchVector")'),
+    ("""SELECT 1 WHERE to_regclass('"Business_name_trgm_idx"') IS NOT NULL""",
+     'CREATE INDEX IF NOT EXISTS "Business_name_trgm_idx" ON "Business" USING GIN (name gin_trgm_ops)'),
+]
+
+# Columns the vector is built from; writes to any of them fire the trigger
+SOURCE_COLUMNS = ['name', 'tags', 'address', 'postcode', 'shortDescription', 'description']
+
+
+def search_vector_sql(row='"Business"'):
+    return f"""
+    setweight(to_tsvector('english', coalesce({row}.name, '')), 'A') ||
+    setweight(to_tsvector('english', array_to_string({row}.tags, ' ')), 'B') ||
+    setweight(to_tsvector('english', coalesce({row}.address, '') || ' ' || coalesce({row}.postcode, '')), 'C') ||
+    setweight(to_tsvector('english', coalesce({row}."shortDescription", '') || ' ' || coalesce({row}.description, '')), 'D')
+"""
+
+
+# Replacing the function body does not lock "Business", so it always runs
+SEARCH_FUNCTION_SQL = f"""
+    CREATE OR REPLACE FUNCTION business_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW."searchVector" := {search_vector_sql('NEW')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+TRIGGER_EXISTS_SQL = """
+    SELECT 1 FROM pg_trigger WHERE tgrelid = '"Business"'::regclass AND tgname = %s
+"""
+
+SEARCH_TRIGGER_SQL = [
+    f'DROP TRIGGER IF EXISTS "{TRIGGER_NAME}" ON "Business"',
+    f"""
+    CREATE TRIGGER "{TRIGGER_NAME}"
+    BEFORE INSERT OR UPDATE OF {', '.join(f'"{c}"' for c in SOURCE_COLUMNS)} ON "Business"
+    FOR EACH ROW EXECUTE FUNCTION business_search_vector()
+    """,
+]
+
+
+def ensure_search_schema(conn, recreate_trigger=False):
+    """Create the search column, indexes and trigger where missing. Commits."""
+    with conn.cursor() as cur:
+        for exists_sql, ddl in SEARCH_SCHEMA_SQL:
+            cur.execute(exists_sql)
+            if not cur.fetchone():
+                cur.execute(ddl)
+        cur.execute(SEARCH_FUNCTION_SQL)
+        cur.execute(TRIGGER_EXISTS_SQL, (TRIGGER_NAME,))
+        if recreate_trigger or not cur.fetchone():
+            for sql in SEARCH_TRIGGER_SQL:
+                cur.execute(sql)
+    conn.commit()
+
+
+def refresh_search_vectors(cur, business_ids=None):
+    """
+    Recompute searchVector for the given ids (all rows if None). Caller commits.
+    Only needed to backfill rows written before the trigger existed.
+    """
+    if business_ids is None:
+        cur.execute(f'UPDATE "Business" SET "searchVector" = {search_vector_sql()}')
+    else:
+        cur.execute(
+            f'UPDATE "Business" SET "searchVector" = {search_vector_sql()} WHERE id = ANY(%s)',
+            (list(business_ids),),
+        )
+    return cur.rowcount
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print(__doc__)
+        exit(1)
+
+    import psycopg2
+
+    load_dotenv(".env.local")
+    load_dotenv()
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("Error: DATABASE_URL not set")
+        exit(1)
+
+    parsed = urlparse(database_url)
+    conn = psycopg2.connect(
+        host=parsed.hostname,
+        port=parsed.port or 5432,
+        database=parsed.path.lstrip('/'),
+        user=parsed.username,
+        password=parsed.password,
+        sslmode='require',
+    )
+    ensure_search_schema(conn, recreate_trigger=True)
+    with conn.cursor() as cur:
+        rows = refresh_search_vectors(cur)
+    conn.commit()
+    conn.close()
+    print(f"Search vectors rebuilt for {rows} businesses")
+
+
+if __name__ == '__main__':
+    main()
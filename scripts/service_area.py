@@ -0,0 +1,100 @@
+"""
+Geographic coverage of the guide listings, one entry per region (town).
+
+Shared by the scraper (where to search), the enricher (which town to name
+in a text search) and the audit (what counts as inside the area).
+
+A business belongs to every region whose search circles contain it, so a
+listing on a shared border shows up in both towns' guides. Nearby Search
+can return places just outside the circle searched; those belong to the
+region(s) of the point that returned them.
+"""
+
+import math
+
+EARTH_RADIUS_M = 6371000
+
+# Region slug -> display name and search points: (label, lat, lng, radius_metres)
+REGIONS = {
+    # Formby village → Hightown → Crosby Beach
+    'formby': {
+        'name': 'Formby',
+        'points': [
+            ("Formby village & inland", 53.5545, -3.0716, 4000),
+            ("Hightown village & beach", 53.5195, -3.0680, 2000),
+            ("Crosby Beach / Another Place", 53.4847, -3.0620, 2000),
+        ],
+    },
+    # Southport town centre → Birkdale → Ainsdale
+    'southport': {
+        'name': 'Southport',
+        'points': [
+            ("Southport town centre & Lord Street", 53.6475, -3.0053, 3000),
+            ("Birkdale village", 53.6330, -3.0160, 1500),
+            ("Ainsdale village & beach", 53.6020, -3.0420, 2000),
+        ],
+    },
+}
+DEFAULT_REGIONS = ['formby']
+
+# Search points of the default region
+SEARCH_POINTS = REGIONS['formby']['points']
+
+# Formby village — the enricher's location bias when a row has no coordinates
+DEFAULT_LAT, DEFAULT_LNG = 53.5545, -3.0716
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Haversine distance in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def parse_regions(value):
+    """'formby,southport' -> ['formby', 'southport']; raises ValueError on an unknown slug."""
+    slugs = [s.strip() for s in value.split(',') if s.strip()]
+    unknown = [s for s in slugs if s not in REGIONS]
+    if unknown:
+        raise ValueError(f"unknown region(s): {', '.join(unknown)} (known: {', '.join(REGIONS)})")
+    return slugs
+
+
+def plan_points(region_slugs):
+    """
+    Search points for a set of regions with each physical area queried once:
+    exact duplicates and circles wholly inside another circle are dropped.
+    Partially overlapping circles are kept; their shared results are
+    deduplicated by place_id.
+    """
+    points = []
+    for slug in region_slugs:
+        for point in REGIONS[slug]['points']:
+            if point[1:] not in (p[1:] for p in points):
+                points.append(point)
+
+    def contained(inner, outer):
+        return distance_m(inner[1], inner[2], outer[1], outer[2]) + inner[3] <= outer[3]
+
+    return [p for p in points if not any(q is not p and q[3] > p[3] and contained(p, q) for q in points)]
+
+
+def regions_for(lat, lng, region_slugs=REGIONS):
+    """Every region with a search circle containing (lat, lng)."""
+    if lat in (None, '') or lng in (None, ''):
+        return []
+    lat, lng = float(lat), float(lng)
+    return [
+        slug for slug in region_slugs
+        if any(distance_m(lat, lng, p[1], p[2]) <= p[3] for p in REGIONS[slug]['points'])
+    ]
+
+
+def point_regions(point):
+    """Regions that list a search point — the fallback for results outside every circle."""
+    return [slug for slug, region in REGIONS.items() if point[1:] in (p[1:] for p in region['points'])]
+
+
+# Every region's area, for checks that should accept a listing from any town
+COVERAGE_POINTS = plan_points(REGIONS)
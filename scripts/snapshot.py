@@ -0,0 +1,93 @@
+"""
+Read/write helpers for the static business snapshot (see export-snapshot.py).
+
+Layout of SNAPSHOT_DIR:
+
+  manifest.json          current version, high-water mark and shard files
+  index.v<N>.json        slug -> [category, byte offset, byte length]
+  <category>.v<N>.jsonl  one compact JSON object per business, sorted by slug
+
+A shard keeps the version it was last rewritten in, so unchanged categories
+carry over between versions untouched. manifest.json is replaced last and
+atomically; a reader that opened it always sees a consistent set of files.
+"""
+
+import os
+import json
+import mmap
+
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshot')
+FORMAT = 1
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def encode(record):
+    return (json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=_json_default) + '\n').encode('utf-8')
+
+
+def write_json_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class Snapshot:
+    """Random access by slug over an exported snapshot; shards are mmap'd on first use."""
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != FORMAT:
+            raise ValueError(f"{directory}: unsupported snapshot format {self.manifest.get('format')}")
+        with open(os.path.join(directory, self.manifest['index']), encoding='utf-8') as f:
+            self.index = json.load(f)
+        self._maps = {}
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    def categories(self):
+        return list(self.manifest['shards'])
+
+    def _shard(self, category):
+        if category not in self._maps:
+            path = os.path.join(self.directory, self.manifest['shards'][category]['file'])
+            with open(path, 'rb') as f:
+                self._maps[category] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+        return self._maps[category]
+
+    def raw(self, slug):
+        """Encoded bytes for one business, or None."""
+        entry = self.index.get(slug)
+        if entry is None:
+            return None
+        category, offset, length = entry
+        return self._shard(category)[offset:offset + length]
+
+    def get(self, slug):
+        data = self.raw(slug)
+        return json.loads(data) if data is not None else None
+
+    def iter_category(self, category):
+        shard = self._shard(category)
+        for line in (shard[:] if shard else b'').splitlines():
+            yield json.loads(line)
+
+    def close(self):
+        for m in self._maps.values():
+            if m:
+                m.close()
+        self._maps = {}
+
+
+def load_snapshot(directory=SNAPSHOT_DIR):
+    """The current snapshot, or None if none has been exported yet."""
+    if not os.path.exists(os.path.join(directory, 'manifest.json')):
+        return None
+    return Snapshot(directory)